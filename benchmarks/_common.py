@@ -0,0 +1,132 @@
+"""Shared helpers for the benchmark scripts: timers, loop-lag sampling, result files."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Benchmarks run against the source tree, not an installed copy
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    """Peak resident set size of this process (or of reaped children), in MiB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how late a periodic sleep() wakes up."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start sampling on the running loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def start_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        loop.call_soon_threadsafe(self.start)
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+
+def write_results(name: str, params: dict, results: dict, out_dir: Path | None = None) -> Path:
+    """Write one benchmark run to <out_dir>/<name>-<commit>-<timestamp>.json."""
+    out_dir = Path(out_dir or RESULTS_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    commit = git_commit()
+    now = datetime.now(timezone.utc)
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    path = out_dir / f"{name}-{commit}-{now.strftime('%Y%m%dT%H%M%S')}.json"
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _flatten(d: dict, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            flat.update(_flatten(v, f"{key}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            flat[key] = v
+    return flat
+
+
+def print_comparison(results: dict, baseline_path: Path) -> None:
+    """Print every numeric metric next to the same metric from a previous run."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    old = _flatten(baseline.get("results", {}))
+    new = _flatten(results)
+    print(f"\nCompared with {baseline.get('commit', '?')} ({Path(baseline_path).name}):")
+    for key in sorted(new):
+        if key not in old:
+            continue
+        before, after = old[key], new[key]
+        delta = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {key:<60} {before:>12.3f} → {after:>12.3f}  ({delta})")
@@ -0,0 +1,220 @@
+"""Conversion throughput benchmark for amdl.converter.
+
+Generates synthetic fixtures locally with ffmpeg (AAC and ALAC .m4a with an
+attached cover, H.264/AAC .mp4), then runs every target format (any
+conversion preset name) of
+convert_audio_file / convert_video_file at each requested concurrency.
+
+Each (source, format, concurrency) cell runs in a fresh child interpreter so
+that RUSAGE_CHILDREN only covers that cell's ffmpeg processes. Reported per
+cell: files/sec, CPU utilisation (ffmpeg user+sys time over wall time × cores),
+peak RSS of a single ffmpeg child, mean output size and failures.
+
+--flac-levels additionally sweeps raw `-compression_level` values so the FLAC
+setting can be picked from data rather than by habit.
+
+Usage:
+  python benchmarks/bench_convert.py
+  python benchmarks/bench_convert.py --concurrency 1,2,4,8 --files 16 --duration 60
+  python benchmarks/bench_convert.py --audio-formats mp3,flac --video-formats none
+  python benchmarks/bench_convert.py --audio-formats mp3-320,mp3-v0,opus-128,flac-fast,flac-max
+  python benchmarks/bench_convert.py --flac-levels 0,5,8 --compare benchmarks/results/convert-....json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from _common import peak_rss_mb, print_comparison, write_results
+
+AUDIO_FORMATS = ["mp3", "flac", "wav", "aac", "m4a", "ogg", "wma", "alac"]
+VIDEO_FORMATS = ["mp4", "mov", "mkv", "avi", "wmv", "flv", "webm"]
+
+
+# ── fixtures ─────────────────────────────────────────────────
+
+def make_fixtures(ffmpeg: str, out_dir: Path, duration: int) -> dict[str, Path]:
+    """Create the synthetic source files; returns {fixture name: path}."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cover = out_dir / "cover.png"
+    fixtures = {
+        "aac": out_dir / "source-aac.m4a",
+        "alac": out_dir / "source-alac.m4a",
+        "h264": out_dir / "source-h264.mp4",
+    }
+    tone = f"sine=frequency=440:sample_rate=44100:duration={duration}"
+    commands = [
+        [ffmpeg, "-y", "-f", "lavfi", "-i", "testsrc=size=600x600:duration=1", "-frames:v", "1", str(cover)],
+        [ffmpeg, "-y", "-f", "lavfi", "-i", tone, "-i", str(cover), "-map", "0:a", "-map", "1:v",
+         "-ac", "2", "-c:a", "aac", "-b:a", "256k", "-c:v", "copy", "-disposition:v", "attached_pic",
+         str(fixtures["aac"])],
+        [ffmpeg, "-y", "-f", "lavfi", "-i", tone, "-i", str(cover), "-map", "0:a", "-map", "1:v",
+         "-ac", "2", "-c:a", "alac", "-c:v", "copy", "-disposition:v", "attached_pic",
+         str(fixtures["alac"])],
+        [ffmpeg, "-y", "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={min(duration, 20)}",
+         "-f", "lavfi", "-i", tone, "-shortest", "-c:v", "libx264", "-preset", "veryfast",
+         "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "256k", str(fixtures["h264"])],
+    ]
+    for cmd in commands:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit(f"Fixture generation failed:\n{' '.join(cmd)}\n{result.stderr[-2000:]}")
+    return fixtures
+
+
+# ── one benchmark cell (runs in a child interpreter) ─────────
+
+def _cpu_children() -> float:
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+def run_cell(kind: str, source: Path, fmt: str, concurrency: int, files: int, ffmpeg: str, work: Path) -> dict:
+    from amdl.converter import convert_audio_file, convert_video_file, target_extension
+
+    convert = convert_audio_file if kind == "audio" else convert_video_file
+    work.mkdir(parents=True, exist_ok=True)
+    sources = []
+    for i in range(files):
+        src = work / f"in-{i}{source.suffix}"
+        shutil.copyfile(source, src)
+        sources.append(src)
+
+    def one(src: Path) -> tuple[bool, int]:
+        target = src.with_name(src.stem + f"-out.{target_extension(fmt)}")
+        ok = convert(str(src), str(target), fmt, ffmpeg, lambda m: None)
+        return ok, target.stat().st_size if ok and target.exists() else 0
+
+    cpu0, t0 = _cpu_children(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, sources))
+    wall, cpu = time.perf_counter() - t0, _cpu_children() - cpu0
+
+    ok = [size for success, size in outcomes if success]
+    return {
+        "files": files,
+        "failed": files - len(ok),
+        "wall_s": round(wall, 3),
+        "files_per_sec": round(len(ok) / wall, 2) if wall else 0,
+        "cpu_s": round(cpu, 3),
+        "cpu_util_pct": round(cpu / (wall * (os.cpu_count() or 1)) * 100, 1) if wall else 0,
+        "ffmpeg_peak_rss_mb": peak_rss_mb(children=True),
+        "mean_output_kb": round(sum(ok) / len(ok) / 1024, 1) if ok else 0,
+    }
+
+
+def run_flac_level(source: Path, level: int, files: int, ffmpeg: str, work: Path) -> dict:
+    """Raw ffmpeg FLAC encode at one compression level (bypasses the converter)."""
+    work.mkdir(parents=True, exist_ok=True)
+    cpu0, t0 = _cpu_children(), time.perf_counter()
+    sizes = []
+    for i in range(files):
+        target = work / f"level{level}-{i}.flac"
+        cmd = [ffmpeg, "-y", "-i", str(source), "-map", "0:a", "-c:a", "flac",
+               "-compression_level", str(level), str(target)]
+        subprocess.run(cmd, capture_output=True)
+        sizes.append(target.stat().st_size if target.exists() else 0)
+    wall, cpu = time.perf_counter() - t0, _cpu_children() - cpu0
+    return {
+        "files": files,
+        "wall_s": round(wall, 3),
+        "files_per_sec": round(files / wall, 2) if wall else 0,
+        "cpu_s": round(cpu, 3),
+        "ffmpeg_peak_rss_mb": peak_rss_mb(children=True),
+        "mean_output_kb": round(sum(sizes) / len(sizes) / 1024, 1) if sizes else 0,
+    }
+
+
+def _child(argv: list[str]) -> dict:
+    """Run one cell in a fresh interpreter so RUSAGE_CHILDREN is per-cell."""
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--_cell", json.dumps(argv)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# ── driver ───────────────────────────────────────────────────
+
+def _csv(value: str) -> list[str]:
+    return [] if value.lower() in ("", "none") else [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == "--_cell":
+        spec = json.loads(sys.argv[2])
+        if spec["mode"] == "flac_level":
+            out = run_flac_level(Path(spec["source"]), spec["level"], spec["files"], spec["ffmpeg"], Path(spec["work"]))
+        else:
+            out = run_cell(spec["kind"], Path(spec["source"]), spec["fmt"], spec["concurrency"],
+                           spec["files"], spec["ffmpeg"], Path(spec["work"]))
+        print(json.dumps(out))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--duration", type=int, default=30, help="fixture length in seconds")
+    parser.add_argument("--files", type=int, default=8, help="files converted per cell")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated pool sizes")
+    parser.add_argument("--audio-formats", default=",".join(AUDIO_FORMATS))
+    parser.add_argument("--video-formats", default=",".join(VIDEO_FORMATS))
+    parser.add_argument("--flac-levels", default="", help="e.g. 0,5,8 — sweep FLAC compression levels")
+    parser.add_argument("--out", type=Path, default=None, help="results directory")
+    parser.add_argument("--compare", type=Path, default=None, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    ffmpeg = shutil.which(args.ffmpeg) or args.ffmpeg
+    if not Path(ffmpeg).exists():
+        raise SystemExit(f"ffmpeg not found: {args.ffmpeg}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="amdl-bench-convert-"))
+    results: dict = {"audio": {}, "video": {}, "flac_levels": {}}
+    try:
+        print("Generating fixtures ...", flush=True)
+        fixtures = make_fixtures(ffmpeg, workdir / "fixtures", args.duration)
+        pools = [int(c) for c in _csv(args.concurrency)]
+
+        cells = [("audio", src, fmt) for src in ("aac", "alac") for fmt in _csv(args.audio_formats)]
+        cells += [("video", "h264", fmt) for fmt in _csv(args.video_formats)]
+        for kind, src, fmt in cells:
+            for n in pools:
+                spec = {
+                    "mode": "convert", "kind": kind, "source": str(fixtures[src]), "fmt": fmt,
+                    "concurrency": n, "files": args.files, "ffmpeg": ffmpeg,
+                    "work": str(workdir / f"{kind}-{src}-{fmt}-{n}"),
+                }
+                cell = _child(spec)
+                results[kind].setdefault(f"{src}->{fmt}", {})[f"c{n}"] = cell
+                print(f"  {kind:5} {src:>4} → {fmt:<5} c={n:<2} "
+                      f"{cell.get('files_per_sec', '-'):>7} files/s  cpu {cell.get('cpu_util_pct', '-'):>5}%  "
+                      f"rss {cell.get('ffmpeg_peak_rss_mb', '-')} MiB  {cell.get('error', '')}", flush=True)
+                shutil.rmtree(spec["work"], ignore_errors=True)
+
+        for level in _csv(args.flac_levels):
+            spec = {"mode": "flac_level", "source": str(fixtures["alac"]), "level": int(level),
+                    "files": args.files, "ffmpeg": ffmpeg, "work": str(workdir / f"flac-{level}")}
+            cell = _child(spec)
+            results["flac_levels"][f"level{level}"] = cell
+            print(f"  flac -compression_level {level}: {cell.get('files_per_sec')} files/s, "
+                  f"{cell.get('mean_output_kb')} KiB/file", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    params = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    path = write_results("convert", params, results, args.out)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""End-to-end download throughput benchmark against the local fake backend.
+
+Scenarios:
+  download_urls  one download_urls() call over every album
+  task_manager   one TaskManager task per album on a private event loop
+  api            POST /api/tasks per album, then follow each over WS /api/ws/{id}
+
+Reported per scenario: tracks/sec, time-to-first-file, Python heap peak
+(tracemalloc), process peak RSS and event-loop lag (the download loops, plus
+the TaskManager / server loop where there is one).
+
+Usage:
+  python benchmarks/bench_download.py
+  python benchmarks/bench_download.py --albums 20 --tracks 12 --scenario api
+  python benchmarks/bench_download.py --compare benchmarks/results/download-abc1234-....json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _common import LoopLagMonitor, peak_rss_mb, print_comparison, write_results
+import fake_backend
+from fake_backend import FakeAppleMusicServer, album_url
+
+TERMINAL = {"completed", "failed", "cancelled"}
+
+
+class _Run:
+    """Collects the metrics shared by every scenario."""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.download_loop_lag: list[LoopLagMonitor] = []
+
+    def on_api_create(self) -> None:
+        # Runs on each download event loop as soon as it starts
+        monitor = LoopLagMonitor()
+        monitor.start()
+        self.download_loop_lag.append(monitor)
+
+    def __enter__(self) -> _Run:
+        fake_backend.reset_stats()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.t0
+        self.heap_peak_mb = None
+        if self.trace_memory:
+            self.heap_peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            tracemalloc.stop()
+        for m in self.download_loop_lag:
+            m.stop()
+
+    def report(self, extra: dict | None = None) -> dict:
+        samples = [s for m in self.download_loop_lag for s in m.samples]
+        merged = LoopLagMonitor()
+        merged.samples = samples
+        stats = fake_backend.STATS
+        result = {
+            "tracks": stats.files,
+            "bytes": stats.bytes,
+            "elapsed_s": round(self.elapsed, 3),
+            "tracks_per_sec": round(stats.files / self.elapsed, 2) if self.elapsed else 0,
+            "time_to_first_file_s": round(stats.first_file_at - self.t0, 3) if stats.first_file_at else None,
+            "heap_peak_mb": self.heap_peak_mb,
+            "rss_peak_mb": peak_rss_mb(),
+            "download_loop_lag": merged.summary(),
+        }
+        result.update(extra or {})
+        return result
+
+
+def bench_download_urls(args, server, workdir: Path, cookies: Path) -> dict:
+    from amdl.core_downloader import download_urls
+
+    run = _Run(args.trace_memory)
+    with fake_backend.install(server, on_api_create=run.on_api_create), run:
+        errors = download_urls(
+            urls=[album_url(i) for i in range(1, args.albums + 1)],
+            cookies_path=cookies,
+            output_path=workdir / "download_urls",
+            temp_path=workdir / "temp",
+            log_callback=lambda m: None,
+        )
+    return run.report({"errors": errors})
+
+
+def bench_task_manager(args, server, workdir: Path, cookies: Path) -> dict:
+    from amdl.task_manager import TaskManager
+
+    async def main(run: _Run) -> dict:
+        tm = TaskManager(max_concurrent=args.workers)
+        tm.start(asyncio.get_running_loop())
+        lag = LoopLagMonitor()
+        lag.start()
+        ids = [
+            await tm.submit({
+                "urls": [album_url(i)],
+                "cookies_path": str(cookies),
+                "output_path": str(workdir / "task_manager"),
+                "temp_path": str(workdir / "temp"),
+            })
+            for i in range(1, args.albums + 1)
+        ]
+        while not all(tm.get_task(t).status.value in TERMINAL for t in ids):
+            await asyncio.sleep(0.01)
+        lag.stop()
+        await tm.stop()
+        statuses = [tm.get_task(t).status.value for t in ids]
+        return {"manager_loop_lag": lag.summary(), "failed_tasks": sum(s != "completed" for s in statuses)}
+
+    run = _Run(args.trace_memory)
+    with fake_backend.install(server, on_api_create=run.on_api_create), run:
+        extra = asyncio.run(main(run))
+    return run.report(extra)
+
+
+def bench_api(args, server, workdir: Path, cookies: Path) -> dict:
+    from fastapi.testclient import TestClient
+
+    import amdl.server as server_module
+    import amdl.task_manager as task_manager_module
+    from amdl.server import app
+    from amdl.settings_store import SettingsStore
+
+    # Fresh singleton so earlier scenarios don't leak into this one
+    task_manager_module._task_manager = task_manager_module.TaskManager(max_concurrent=args.workers)
+    # Keep the server off the repo's settings.json (task defaults) and ./temp (temp GC)
+    server_module.settings_store = SettingsStore(workdir / "settings.json")
+    server_module.TEMP_DIR = workdir / "temp"
+
+    run = _Run(args.trace_memory)
+    ws_messages = 0
+    server_lag = LoopLagMonitor()
+    with fake_backend.install(server, on_api_create=run.on_api_create), run:
+        with TestClient(app) as client:
+            client.portal.call(server_lag.start)
+            ids = []
+            for i in range(1, args.albums + 1):
+                resp = client.post("/api/tasks", json={
+                    "urls": [album_url(i)],
+                    "cookies_path": str(cookies),
+                    "output_path": str(workdir / "api"),
+                    "temp_path": str(workdir / "temp"),
+                })
+                resp.raise_for_status()
+                ids.append(resp.json()["task_id"])
+            for task_id in ids:
+                with client.websocket_connect(f"/api/ws/{task_id}") as ws:
+                    while True:
+                        msg = ws.receive_json()
+                        ws_messages += 1
+                        if msg.get("status") in TERMINAL:
+                            break
+            client.portal.call(server_lag.stop)
+    return run.report({"ws_messages": ws_messages, "server_loop_lag": server_lag.summary()})
+
+
+SCENARIOS = {
+    "download_urls": bench_download_urls,
+    "task_manager": bench_task_manager,
+    "api": bench_api,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--albums", type=int, default=10)
+    parser.add_argument("--tracks", type=int, default=10, help="tracks per album")
+    parser.add_argument("--segments", type=int, default=8, help="HLS segments per track")
+    parser.add_argument("--segment-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="artificial per-request server latency")
+    parser.add_argument("--workers", type=int, default=1, help="TaskManager max_concurrent")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="skip tracemalloc (it slows Python code down noticeably)")
+    parser.add_argument("--out", type=Path, default=None, help="results directory")
+    parser.add_argument("--compare", type=Path, default=None, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    server = FakeAppleMusicServer(args.tracks, args.segments, args.segment_kb, args.latency_ms).start()
+    workdir = Path(tempfile.mkdtemp(prefix="amdl-bench-"))
+    cookies = workdir / "cookies.txt"
+    cookies.write_text("# Netscape HTTP Cookie File\n", encoding="utf-8")
+
+    results: dict = {}
+    try:
+        names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        for name in names:
+            print(f"→ {name} ...", flush=True)
+            results[name] = SCENARIOS[name](args, server, workdir, cookies)
+            r = results[name]
+            print(
+                f"  {r['tracks']} tracks in {r['elapsed_s']}s → {r['tracks_per_sec']} tracks/s, "
+                f"first file {r['time_to_first_file_s']}s, heap peak {r['heap_peak_mb']} MiB, "
+                f"loop lag p99 {r['download_loop_lag'].get('p99_ms')} ms"
+            )
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    params = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    path = write_results("download", params, results, args.out)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
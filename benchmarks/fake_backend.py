@@ -0,0 +1,240 @@
+"""Local fake Apple Music backend for benchmarks.
+
+Two halves:
+
+- FakeAppleMusicServer: a threaded HTTP server on 127.0.0.1 that serves a
+  synthetic catalog (albums of N tracks) and synthetic HLS media (an m3u8
+  playlist plus fixed-size fMP4-like segments per track).
+- install(): swaps the gamdl classes that amdl.core_downloader uses for
+  fakes that talk to that server over httpx, so download_urls(),
+  TaskManager and the HTTP API run their real code paths end to end without
+  cookies, DRM or network access.
+
+Album URLs look like https://music.apple.com/us/album/bench/<album_id>.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+# Filled in by the fakes while a benchmark runs
+STATS = SimpleNamespace(first_file_at=None, files=0, bytes=0, lock=threading.Lock())
+
+
+def reset_stats() -> None:
+    with STATS.lock:
+        STATS.first_file_at = None
+        STATS.files = 0
+        STATS.bytes = 0
+
+
+def album_url(album_id: int | str, storefront: str = "us") -> str:
+    return f"https://music.apple.com/{storefront}/album/bench/{album_id}"
+
+
+# ── HTTP side ────────────────────────────────────────────────
+
+class FakeAppleMusicServer:
+    """Threaded HTTP server serving a synthetic catalog and HLS media."""
+
+    def __init__(self, tracks_per_album: int = 10, segments: int = 8, segment_kb: int = 64, latency_ms: float = 0.0):
+        self.tracks_per_album = tracks_per_album
+        self.segments = segments
+        self.segment = os.urandom(segment_kb * 1024)
+        self.latency = latency_ms / 1000
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> FakeAppleMusicServer:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+            def _send(self, body: bytes, content_type: str):
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                # /v1/catalog/<sf>/albums/<id>
+                if parts[:2] == ["v1", "catalog"] and len(parts) == 5 and parts[3] == "albums":
+                    self._send(json.dumps(server.album_json(parts[2], parts[4])).encode(), "application/json")
+                # /hls/<track_id>/main.m3u8
+                elif parts[0] == "hls" and len(parts) == 3 and parts[2] == "main.m3u8":
+                    self._send(server.playlist(parts[1]).encode(), "application/vnd.apple.mpegurl")
+                # /hls/<track_id>/seg<k>.m4s
+                elif parts[0] == "hls" and len(parts) == 3 and parts[2].startswith("seg"):
+                    self._send(server.segment, "video/iso.segment")
+                else:
+                    self.send_error(404)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def album_json(self, storefront: str, album_id: str) -> dict:
+        tracks = [
+            {
+                "id": f"{album_id}{n:03d}",
+                "type": "songs",
+                "attributes": {"name": f"Track {n}", "trackNumber": n, "albumName": f"Album {album_id}"},
+            }
+            for n in range(1, self.tracks_per_album + 1)
+        ]
+        return {
+            "data": [{
+                "id": album_id,
+                "type": "albums",
+                "attributes": {"name": f"Album {album_id}", "artistName": "Bench Artist"},
+                "relationships": {"tracks": {"data": tracks}},
+            }]
+        }
+
+    def playlist(self, track_id: str) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-TARGETDURATION:6", '#EXT-X-MAP:URI="seg0.m4s"']
+        for k in range(1, self.segments + 1):
+            lines += ["#EXTINF:6.0,", f"seg{k}.m4s"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+
+# ── gamdl side ───────────────────────────────────────────────
+
+_BASE_URL: str | None = None
+_ON_API_CREATE = None  # hook called on the download loop when the fake API is created
+
+
+class _Stub:
+    """Accepts and stores any constructor arguments."""
+
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        return cls(*args, **kwargs)
+
+
+class FakeAppleMusicApi(_Stub):
+    active_subscription = True
+
+    @classmethod
+    async def create_from_netscape_cookies(cls, cookies_path: str, language: str = "en-US", **kwargs):
+        if _ON_API_CREATE:
+            _ON_API_CREATE()
+        return cls(cookies_path=cookies_path, language=language)
+
+
+class FakeDownloader:
+    """Stands in for gamdl's AppleMusicDownloader."""
+
+    def __init__(self, song, music_video, uploaded_video, overwrite: bool = False, **kwargs):
+        self.base = song.base
+        self.overwrite = overwrite
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=_BASE_URL, timeout=30)
+        return self._client
+
+    async def get_download_item_from_url(self, url: str):
+        parts = url.rstrip("/").split("/")
+        storefront, album_id = parts[3], parts[-1]
+        resp = await self.client.get(f"/v1/catalog/{storefront}/albums/{album_id}")
+        resp.raise_for_status()
+        album = resp.json()["data"][0]
+        folder = Path(self.base.output_path) / album["attributes"]["artistName"] / album["attributes"]["name"]
+        for track in album["relationships"]["tracks"]["data"]:
+            attrs = track["attributes"]
+            yield SimpleNamespace(
+                media=SimpleNamespace(error=None, partial=False, media_metadata=track),
+                final_path=str(folder / f"{attrs['trackNumber']:02d} {attrs['name']}.m4a"),
+            )
+
+    async def download(self, item) -> None:
+        from gamdl.downloader.exceptions import GamdlDownloaderMediaFileExistsError
+
+        final = Path(item.final_path)
+        if final.exists() and not self.overwrite:
+            raise GamdlDownloaderMediaFileExistsError(item.final_path)
+        track_id = item.media.media_metadata["id"]
+        playlist = (await self.client.get(f"/hls/{track_id}/main.m3u8")).text
+        segments = ["seg0.m4s"] + [ln for ln in playlist.splitlines() if ln and not ln.startswith("#")]
+        final.parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        with open(final, "wb") as f:
+            for seg in segments:
+                data = (await self.client.get(f"/hls/{track_id}/{seg}")).content
+                f.write(data)
+                size += len(data)
+        with STATS.lock:
+            if STATS.first_file_at is None:
+                STATS.first_file_at = time.perf_counter()
+            STATS.files += 1
+            STATS.bytes += size
+
+
+_PATCHED_NAMES = {
+    "AppleMusicApi": FakeAppleMusicApi,
+    "AppleMusicBaseInterface": _Stub,
+    "AppleMusicSongInterface": _Stub,
+    "AppleMusicMusicVideoInterface": _Stub,
+    "AppleMusicUploadedVideoInterface": _Stub,
+    "AppleMusicInterface": _Stub,
+    "AppleMusicBaseDownloader": _Stub,
+    "AppleMusicSongDownloader": _Stub,
+    "AppleMusicMusicVideoDownloader": _Stub,
+    "AppleMusicUploadedVideoDownloader": _Stub,
+    "AppleMusicDownloader": FakeDownloader,
+}
+
+
+@contextlib.contextmanager
+def install(server: FakeAppleMusicServer, on_api_create=None):
+    """Route amdl.core_downloader through the fake backend for the duration of the block."""
+    global _BASE_URL, _ON_API_CREATE
+    import amdl.core_downloader as core
+
+    saved = {name: getattr(core, name) for name in _PATCHED_NAMES}
+    _BASE_URL, _ON_API_CREATE = server.base_url, on_api_create
+    for name, fake in _PATCHED_NAMES.items():
+        setattr(core, name, fake)
+    try:
+        yield
+    finally:
+        for name, original in saved.items():
+            setattr(core, name, original)
+        _BASE_URL, _ON_API_CREATE = None, None
@@ -0,0 +1,162 @@
+"""Canonical catalog references for URL lists, and batched catalog lookups.
+
+Every URL is reduced to (storefront, type, id) with gamdl's own URL pattern
+before anything touches the network:
+
+- `album/<slug>/<id>?i=<song id>` is the song `<song id>`
+- slugs, query strings and letter case do not matter
+- the storefront is recorded but not part of the identity: gamdl looks
+  everything up in the account's storefront, so /us/ and /jp/ links to the
+  same id download the same thing
+
+Duplicates are dropped, and so are song links whose album was listed
+earlier. The source is processed in windows of `BATCH_SIZE` URLs. Only an
+8-byte hash per distinct reference is kept across windows, so a URL file
+is never held in memory as a whole. A song link that comes before its
+album is therefore not dropped. Downloading it early does no harm.
+
+Within a window, songs and music videos are fetched in one request per type
+with the catalog's
+multi-id endpoints (`/songs?ids=a,b,c`) instead of one request per URL, and
+the metadata is handed to gamdl so it does not fetch it again. Albums,
+playlists, artists, posts and library items have no such shortcut in gamdl
+and go through the normal per-URL path, as does anything a batch did not
+return.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator
+
+from gamdl.interface.constants import VALID_URL_PATTERN
+
+from amdl.url_source import digest
+
+logger = logging.getLogger("amdl.catalog")
+
+# URL type → (catalog resource, query params matching gamdl's single lookups)
+BATCH_TYPES = {
+    "song": ("songs", {"extend": "extendedAssetUrls", "include": "lyrics,albums"}),
+    "music-video": ("music-videos", {"include": "albums"}),
+}
+BATCH_SIZE = 100
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogRef:
+    storefront: str | None
+    type: str  # artist, album, playlist, song, music-video, post or library-<type>
+    id: str
+    album_id: str | None = None  # set for album/...?i=<song id> links
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.type, self.id)
+
+
+def parse_catalog_url(url: str) -> CatalogRef | None:
+    """The catalog reference of an Apple Music URL, or None if gamdl would not accept it."""
+    match = VALID_URL_PATTERN.match(url)
+    if not match:
+        return None
+    g = match.groupdict()
+    if g["library_type"]:
+        return CatalogRef(g["library_storefront"], f"library-{g['library_type']}", g["library_id"])
+    if g["sub_id"]:
+        return CatalogRef(g["storefront"], "song", g["sub_id"], album_id=g["id"] if g["type"] == "album" else None)
+    return CatalogRef(g["storefront"], g["type"], g["id"])
+
+
+# (URL as given, its reference); the reference is None for URLs gamdl will reject
+PlanEntry = tuple[str, CatalogRef | None]
+
+
+def _key_digest(type: str, id: str) -> int:
+    return digest(f"{type}/{id}")
+
+
+class CatalogPlanner:
+    """Canonicalise `urls` lazily, dropping duplicates and songs covered by an earlier album.
+
+    Counters (`duplicates`, `covered`) are filled in while iterating. A
+    planner can be iterated once.
+    """
+
+    def __init__(self, urls: Iterable[str], window: int = BATCH_SIZE):
+        self.urls = urls
+        self.window = window
+        self.duplicates = 0
+        self.covered = 0  # song links dropped because their album was listed
+        self._seen: set[int] = set()
+
+    def __iter__(self) -> Iterator[PlanEntry]:
+        for url in self.urls:
+            ref = parse_catalog_url(url)
+            if ref is not None:
+                key = _key_digest(ref.type, ref.id)
+                if key in self._seen:
+                    self.duplicates += 1
+                    continue
+                if ref.album_id is not None and _key_digest("album", ref.album_id) in self._seen:
+                    self.covered += 1
+                    continue
+                self._seen.add(key)
+            yield url, ref
+
+    def windows(self) -> Iterator[list[PlanEntry]]:
+        """The planned entries in input order, in lists of at most `window`."""
+        window: list[PlanEntry] = []
+        for entry in self:
+            window.append(entry)
+            if len(window) >= self.window:
+                yield window
+                window = []
+        if window:
+            yield window
+
+
+def discard_ids(entries: list[PlanEntry], ids: set[str], types: Iterable[str] = tuple(BATCH_TYPES)) -> list[PlanEntry]:
+    """`entries` without the references of `types` whose id is in `ids`."""
+    types = set(types)
+    return [(url, ref) for url, ref in entries if ref is None or ref.type not in types or ref.id not in ids]
+
+
+async def prefetch_catalog(
+    api, entries: list[PlanEntry], batch_size: int = BATCH_SIZE
+) -> dict[tuple[str, str], dict]:
+    """Fetch song and music-video metadata for `entries` in batches, keyed by CatalogRef.key.
+
+    A failed batch is logged and skipped; its items fall back to per-URL lookups.
+    """
+    metadata: dict[tuple[str, str], dict] = {}
+    for type, (resource, params) in BATCH_TYPES.items():
+        ids = [ref.id for _, ref in entries if ref is not None and ref.type == type]
+        if len(ids) < 2:
+            continue  # a single id gains nothing from the batch endpoint
+        uri = f"/v1/catalog/{api.storefront}/{resource}"
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start : start + batch_size]
+            try:
+                response = await api._amp_request(uri, {"ids": ",".join(chunk), **params})
+            except Exception as e:
+                logger.warning(f"Batch lookup of {len(chunk)} {resource} failed, falling back to single lookups: {e}")
+                continue
+            for item in response.get("data", []):
+                metadata[(type, item["id"])] = item
+    return metadata
+
+
+async def iter_download_items(downloader, url: str, ref: CatalogRef | None, prefetched: dict) -> AsyncIterator:
+    """Download items for one URL, using prefetched metadata when there is some."""
+    metadata = prefetched.get(ref.key) if ref is not None else None
+    if metadata is None:
+        async for item in downloader.get_download_item_from_url(url):
+            yield item
+        return
+
+    interface = downloader.base.interface
+    get_media = interface._get_song_media if ref.type == "song" else interface._get_music_video_media
+    async for media in get_media(media_id=ref.id, index=0, total=1, media_metadata=metadata):
+        yield await downloader.parse_download_item(media)
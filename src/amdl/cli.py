@@ -1,4 +1,5 @@
 from __future__ import annotations
+import os
 import sys
 
 _HELP = """\
@@ -7,16 +8,22 @@ AppleMusic Downloader (amdl) v2.4.6
 Usage:
   amdl --server [options]     Start API server
   amdl --desktop              Launch desktop app
+  amdl --reindex DIR          Rebuild the library index of DIR from file tags
   amdl <gamdl args...>        Pass through to gamdl CLI
 
 Server options:
   --host HOST        Listen address (default: 127.0.0.1)
   --port PORT        Listen port (default: 8000)
   --log-level LEVEL  Log level: DEBUG, INFO, WARNING, ERROR (default: INFO)
+  --profile-dir DIR  Profile every task with cProfile, write artifacts to DIR
+
+Reindex options:
+  --index PATH       Index database (default: DIR/.amdl-library.db)
 
 Examples:
   amdl --server --host 0.0.0.0 --port 8000
   amdl --desktop
+  amdl --reindex "./Apple Music"
   amdl -c /path/to/cookies.txt "https://music.apple.com/..."
   amdl --help
 """
@@ -28,6 +35,7 @@ def main():
     Usage:
         amdl --server [--host HOST] [--port PORT]   # 启动 API 服务
         amdl --desktop                                # 启动桌面应用
+        amdl --reindex DIR [--index PATH]             # 重建曲库索引
         amdl <gamdl args...>                          # 透传 gamdl 命令行
     """
     args = sys.argv[1:] if len(sys.argv) > 1 else []
@@ -45,6 +53,7 @@ def main():
         host = "127.0.0.1"
         port = 8000
         log_level = "info"
+        profile_dir = None
         i = 1
         while i < len(args):
             if args[i] == "--host" and i + 1 < len(args):
@@ -56,9 +65,12 @@ def main():
             elif args[i] == "--log-level" and i + 1 < len(args):
                 log_level = args[i + 1]
                 i += 2
+            elif args[i] == "--profile-dir" and i + 1 < len(args):
+                profile_dir = args[i + 1]
+                i += 2
             else:
                 i += 1
-        run_server(host=host, port=port, log_level=log_level)
+        run_server(host=host, port=port, log_level=log_level, profile_dir=profile_dir)
         return
 
     # ── 桌面模式 ──────────────────────────────────────────────
@@ -68,6 +80,27 @@ def main():
         run_desktop()
         return
 
+    # ── 曲库索引重建 ──────────────────────────────────────────
+    if args[0] == "--reindex":
+        from amdl.library_index import LibraryIndex, default_index_path
+
+        if len(args) < 2 or args[1].startswith("--"):
+            print("Usage: amdl --reindex DIR [--index PATH]")
+            sys.exit(2)
+        library_root = args[1]
+        if not os.path.isdir(library_root):
+            print(f"Not a directory: {library_root}")
+            sys.exit(2)
+        index_path = default_index_path(library_root)
+        if "--index" in args[2:]:
+            i = args.index("--index", 2)
+            if i + 1 < len(args):
+                index_path = args[i + 1]
+        with LibraryIndex(index_path) as index:
+            result = index.reindex(library_root)
+            print(f"{index_path}: {result} ({len(index)} tracks)")
+        return
+
     # ── 默认：透传给 gamdl ────────────────────────────────────
     from gamdl.cli.cli import main as gamdl_main
 
@@ -1,24 +1,36 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import shutil
 import subprocess
-import sys
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable
+from typing import Awaitable, Callable
 
-
-def _get_startupinfo():
-    """Windows 下隐藏命令行窗口，其他系统返回 None"""
-    if sys.platform == "win32":
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        return startupinfo
-    return None
+from amdl.media_probe import MediaInfo, probe_many, probe_media
+from amdl.presets import ConversionPreset, get_preset, split_formats
+from amdl.resources import JOB_AUDIO, JOB_REMUX, JOB_VIDEO, Lease, get_resource_manager
+from amdl.utils import get_startupinfo
 
 
 LogFunc = Callable[[str], None]
+# (percent 0-100, ffmpeg speed such as "23.4x" or None)
+ProgressFunc = Callable[[float, str | None], None]
+# (file name, percent, speed) — per-file progress for batch conversions
+FileProgressFunc = Callable[[str, float, str | None], None]
+# (source path, converted paths — empty on failure/skip) — called once per submitted file
+# may be a coroutine function; it is awaited on the converter's loop
+FileDoneFunc = Callable[[str, list[str]], Awaitable[None] | None]
+
+_AUDIO_EXTS = (".m4a", ".mp4")
+_VIDEO_EXTS = (".mp4", ".mov", ".m4v")
+
+# How many trailing stderr lines of an ffmpeg run are kept for error reports
+STDERR_TAIL_LINES = 40
 
 
 def resolve_ffmpeg_executable(
@@ -48,171 +60,429 @@ def resolve_ffmpeg_executable(
     return None
 
 
-def _run_subprocess(cmd: list[str]) -> tuple[int, str, str]:
+class _ProgressParser:
+    """Incremental parser for ffmpeg's machine-readable `-progress` stream.
+
+    ffmpeg writes blocks of key=value lines terminated by progress=continue
+    (or progress=end on the last block).
+    """
+
+    def __init__(self, duration: float | None, on_progress: ProgressFunc | None):
+        self.duration = duration
+        self.on_progress = on_progress
+        self._block: dict[str, str] = {}
+
+    def feed(self, line: str) -> None:
+        key, _, value = line.strip().partition("=")
+        if not key:
+            return
+        if key != "progress":
+            self._block[key] = value.strip()
+            return
+        if self.on_progress:
+            percent = 100.0 if value == "end" else self._percent()
+            speed = self._block.get("speed")
+            self.on_progress(percent, speed if speed and speed != "N/A" else None)
+        self._block = {}
+
+    def _percent(self) -> float:
+        # out_time_ms is in microseconds too (historical ffmpeg naming)
+        raw = self._block.get("out_time_us") or self._block.get("out_time_ms")
+        if not self.duration or not raw:
+            return 0.0
+        try:
+            seconds = int(raw) / 1_000_000
+        except ValueError:
+            return 0.0
+        return max(0.0, min(100.0, round(seconds / self.duration * 100, 1)))
+
+
+def _with_progress_args(cmd: list[str]) -> list[str]:
+    """Insert the global options that route progress to stdout and silence stats."""
+    return [cmd[0], "-hide_banner", "-nostats", "-progress", "pipe:1", *cmd[1:]]
+
+
+def _run_ffmpeg(
+    cmd: list[str],
+    duration: float | None = None,
+    on_progress: ProgressFunc | None = None,
+    lease: Lease | None = None,
+) -> tuple[int, str]:
+    """Run ffmpeg, streaming its progress and keeping only a tail of stderr.
+
+    Returns (returncode, stderr_tail). Exceptions raised by on_progress (for
+    example InterruptedError on task cancellation) kill ffmpeg and propagate.
+    """
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            startupinfo=_get_startupinfo(),
+        proc = subprocess.Popen(
+            _with_progress_args(cmd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=get_startupinfo(),
+            **(lease.popen_kwargs() if lease else {}),
         )
-        return result.returncode, result.stdout, result.stderr
     except Exception as error:
-        return 1, "", str(error)
+        return 1, str(error)
+    if lease:
+        lease.apply_to_process(proc.pid)
 
+    tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
 
-def convert_audio_file(
+    def drain_stderr():
+        for raw in proc.stderr:
+            tail.append(raw.decode("utf-8", "replace").rstrip())
+
+    reader = threading.Thread(target=drain_stderr, daemon=True)
+    reader.start()
+    parser = _ProgressParser(duration, on_progress)
+    try:
+        for raw in proc.stdout:
+            parser.feed(raw.decode("utf-8", "replace"))
+        code = proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        reader.join(timeout=5)
+    return code, "\n".join(tail)
+
+
+def target_extension(target_format: str) -> str:
+    """File extension (without dot) a preset or format name produces, e.g. alac → m4a, mp3-v0 → mp3."""
+    preset = get_preset(target_format)
+    return preset.extension if preset else target_format.lower()
+
+
+@lru_cache(maxsize=8)
+def resolve_ffprobe_executable(ffmpeg_exe: str | None) -> str | None:
+    """Find ffprobe next to the given ffmpeg binary, falling back to PATH."""
+    if ffmpeg_exe:
+        ffmpeg = Path(ffmpeg_exe)
+        sibling = ffmpeg.with_name(ffmpeg.name.replace("ffmpeg", "ffprobe"))
+        if sibling != ffmpeg and sibling.exists():
+            return str(sibling)
+    return shutil.which("ffprobe")
+
+
+def _audio_preset(target_format: str) -> ConversionPreset:
+    preset = get_preset(target_format)
+    if preset is None or preset.kind != "audio":
+        preset = get_preset("m4a")
+    return preset
+
+
+def _audio_output_args(target_format: str, info: MediaInfo | None) -> tuple[list[str], bool]:
+    """Stream maps and codec options for one audio output; returns (args, is_copy)."""
+    target = _audio_preset(target_format)
+    audio = info.audio if info else None
+    is_copy = audio is not None and _codec_ok(audio.codec_name, target.copy_audio_codecs)
+
+    args: list[str] = []
+    if info is None:
+        args += ["-map", "0:0"]
+        if target.keeps_cover:
+            args += ["-map", "0:1?", "-c:v", "copy"]
+    else:
+        args += ["-map", f"0:{audio.index}"]
+        if target.keeps_cover and info.cover:
+            args += ["-map", f"0:{info.cover.index}", "-c:v", "copy"]
+
+    if is_copy:
+        args += ["-c:a", "copy"]
+    else:
+        args += list(target.audio_args)
+        if audio and target.max_channels and (audio.channels or 0) > target.max_channels:
+            args += ["-ac", str(target.max_channels)]
+        if audio and target.max_sample_rate and (audio.sample_rate or 0) > target.max_sample_rate:
+            args += ["-ar", str(target.max_sample_rate)]
+    args += list(target.extra_args)
+    return args, is_copy
+
+
+def plan_audio_outputs(
+    source_path: str,
+    outputs: list[tuple[str, str]],
+    ffmpeg_exe: str,
+    info: MediaInfo | None,
+) -> tuple[list[str], list[bool]]:
+    """Build one ffmpeg command writing every (format, path) output.
+
+    The source is read and decoded once; ffmpeg hands the decoded audio to
+    each output's encoder, so N formats cost one decode plus N encodes.
+    Returns (cmd, is_copy per output).
+    """
+    cmd = [ffmpeg_exe, "-y", "-i", source_path]
+    copies: list[bool] = []
+    for target_format, target_path in outputs:
+        args, is_copy = _audio_output_args(target_format, info)
+        cmd += [*args, target_path]
+        copies.append(is_copy)
+    return cmd, copies
+
+
+def plan_audio_conversion(
     source_path: str,
     target_path: str,
     target_format: str,
-    ffmpeg_exe: str | None,
-    log: LogFunc,
-) -> bool:
+    ffmpeg_exe: str,
+    info: MediaInfo | None,
+) -> tuple[list[str], bool]:
+    """Build the ffmpeg command for one audio conversion.
+
+    Returns (cmd, is_copy). The audio stream is copied whenever the target
+    container can hold the source codec; otherwise it is re-encoded, keeping
+    the source channel layout and sample rate unless the encoder cannot take
+    them. Without probe info the historical fixed stream mapping is used.
+    """
+    cmd, copies = plan_audio_outputs(source_path, [(target_format, target_path)], ffmpeg_exe, info)
+    return cmd, copies[0]
+
+
+def _codec_ok(codec: str | None, allowed: frozenset[str] | None) -> bool:
+    return allowed is None or codec in allowed
+
+
+def _video_copy_ok(preset: ConversionPreset, info: MediaInfo | None) -> bool:
+    if preset.copy_video_codecs is None and preset.copy_audio_codecs is None:
+        return True
+    if info is None:
+        return False
+    if info.video and not _codec_ok(info.video.codec_name, preset.copy_video_codecs):
+        return False
+    if info.audio and not _codec_ok(info.audio.codec_name, preset.copy_audio_codecs):
+        return False
+    return True
+
+
+def _video_is_copy(target_format: str, info: MediaInfo | None) -> bool:
+    preset = get_preset(target_format)
+    return preset is None or preset.kind != "video" or _video_copy_ok(preset, info)
+
+
+def _video_output_args(target_format: str, info: MediaInfo | None) -> list[str]:
+    maps: list[str] = []
+    if info is not None:
+        if info.video:
+            maps += ["-map", f"0:{info.video.index}"]
+        if info.audio:
+            maps += ["-map", f"0:{info.audio.index}"]
+
+    preset = get_preset(target_format)
+    if _video_is_copy(target_format, info):
+        args = [*maps, "-c", "copy"]
+    else:
+        args = [*maps, *preset.video_args, *preset.audio_args]
+    if preset is not None:
+        args += list(preset.extra_args)
+    return args
+
+
+def plan_video_outputs(
+    source_path: str,
+    outputs: list[tuple[str, str]],
+    ffmpeg_exe: str,
+    info: MediaInfo | None,
+) -> list[str]:
+    """Video counterpart of plan_audio_outputs: one input, one output per (format, path)."""
+    cmd = [ffmpeg_exe, "-y", "-i", source_path]
+    for target_format, target_path in outputs:
+        cmd += [*_video_output_args(target_format, info), target_path]
+    return cmd
+
+
+def plan_video_conversion(
+    source_path: str,
+    target_path: str,
+    target_format: str,
+    ffmpeg_exe: str,
+    info: MediaInfo | None,
+) -> list[str]:
+    """Build the ffmpeg command for one video conversion.
+
+    Streams are copied when the target container accepts the probed codecs;
+    with probe info the main video and audio streams are mapped explicitly so
+    cover art is never mistaken for the video track. Unknown formats remux.
+    """
+    return plan_video_outputs(source_path, [(target_format, target_path)], ffmpeg_exe, info)
+
+
+def conversion_targets(source_path: str | Path, formats: str | list[str] | None) -> list[tuple[str, str]]:
+    """(format, target path) for each requested format, next to the source.
+
+    Formats whose target path repeats an earlier one (e.g. flac-max,flac-fast)
+    are dropped — only one output per file name is possible.
+    """
+    if isinstance(formats, str) or formats is None:
+        formats = split_formats(formats)
+    base = os.path.splitext(str(source_path))[0]
+    targets: dict[str, str] = {}
+    for fmt in formats:
+        targets.setdefault(f"{base}.{target_extension(fmt)}", fmt)
+    return [(fmt, path) for path, fmt in targets.items()]
+
+
+@dataclass
+class _ConversionJob:
+    """A planned ffmpeg run, shared by the sync and async converters."""
+
+    cmd: list[str] | None  # None = nothing to run
+    duration: float | None = None
+    kind: str = JOB_REMUX  # resource class the run is budgeted as
+    cost: float | None = None  # summed preset cpu_cost of the encoded outputs
+    # (path ffmpeg writes, final path) per output; they differ for in-place conversions
+    outputs: list[tuple[str, str]] = field(default_factory=list)
+    # final paths that need no ffmpeg run (the source already is that target)
+    ready: list[str] = field(default_factory=list)
+
+
+def _check_inputs(source_path: str, ffmpeg_exe: str | None, log: LogFunc) -> bool:
     if not os.path.exists(source_path):
         log(f"    错误: 源文件不存在: {source_path}")
         return False
     if not ffmpeg_exe:
         log("    错误: FFmpeg不可用")
         return False
+    return True
 
-    target_format = target_format.lower()
-    if target_format == "mp3":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "libmp3lame",
-            "-b:a",
-            "320k",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            "-id3v2_version",
-            "3",
-            "-write_id3v1",
-            "1",
-            target_path,
-        ]
-    elif target_format == "flac":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "flac",
-            "-compression_level",
-            "8",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-    elif target_format == "wav":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "pcm_s16le",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-    elif target_format in ("aac", "m4a"):
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "aac",
-            "-b:a",
-            "256k",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-    elif target_format == "ogg":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "libvorbis",
-            "-q:a",
-            "5",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-    elif target_format == "wma":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "wmav2",
-            "-b:a",
-            "192k",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-    else:
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:a",
-            "aac",
-            "-b:a",
-            "256k",
-            "-c:v",
-            "copy",
-            "-map",
-            "0:0",
-            "-map",
-            "0:1?",
-            target_path,
-        ]
-
-    log(f"    执行转换命令: {' '.join(cmd)}")
-    code, stdout, stderr = _run_subprocess(cmd)
+
+def _output_path(source_path: str, target_path: str) -> str:
+    """Where ffmpeg writes `target_path`: a temp name when it would overwrite the source."""
+    if os.path.abspath(source_path) != os.path.abspath(target_path):
+        return target_path
+    base, ext = os.path.splitext(target_path)
+    return f"{base}.converting{ext}"
+
+
+def _prepare_audio_job(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+) -> _ConversionJob:
+    if not _check_inputs(source_path, ffmpeg_exe, log):
+        return _ConversionJob(None)
+
+    info = probe_media(source_path, resolve_ffprobe_executable(ffmpeg_exe))
+    if info is not None and info.audio is None:
+        log(f"    错误: 源文件没有音频流: {source_path}")
+        return _ConversionJob(None)
+    source_codec = info.audio.codec_name if info else None
+
+    planned: list[tuple[str, str]] = []
+    job = _ConversionJob(None, duration=info.duration if info else None)
+    for target_format, target_path in targets:
+        output_path = _output_path(source_path, target_path)
+        if output_path != target_path and _audio_output_args(target_format, info)[1]:
+            log(f"    源文件已是 {target_format} ({source_codec})，无需转换")
+            job.ready.append(target_path)
+            continue
+        planned.append((target_format, output_path))
+        job.outputs.append((output_path, target_path))
+    if not planned:
+        return job
+
+    job.cmd, copies = plan_audio_outputs(source_path, planned, ffmpeg_exe, info)
+    job.kind = JOB_REMUX if all(copies) else JOB_AUDIO
+    job.cost = sum(_audio_preset(fmt).cpu_cost for (fmt, _), is_copy in zip(planned, copies) if not is_copy)
+    modes = [f"流复制 ({source_codec})" if is_copy else "转码" for is_copy in copies]
+    if len(planned) > 1:
+        modes = [f"{fmt}: {mode}" for (fmt, _), mode in zip(planned, modes)]
+    log(f"    执行转换命令 [{', '.join(modes)}]: {' '.join(job.cmd)}")
+    return job
+
+
+def _prepare_video_job(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+) -> _ConversionJob:
+    if not _check_inputs(source_path, ffmpeg_exe, log):
+        return _ConversionJob(None)
+
+    info = probe_media(source_path, resolve_ffprobe_executable(ffmpeg_exe))
+    planned: list[tuple[str, str]] = []
+    encoded: list[str] = []
+    job = _ConversionJob(None, duration=info.duration if info else None)
+    for target_format, target_path in targets:
+        output_path = _output_path(source_path, target_path)
+        is_copy = _video_is_copy(target_format, info)
+        if output_path != target_path and is_copy:
+            log(f"    源文件已是 {target_format}，无需转换")
+            job.ready.append(target_path)
+            continue
+        planned.append((target_format, output_path))
+        job.outputs.append((output_path, target_path))
+        if not is_copy:
+            encoded.append(target_format)
+    if not planned:
+        return job
+
+    job.cmd = plan_video_outputs(source_path, planned, ffmpeg_exe, info)
+    job.kind = JOB_VIDEO if encoded else JOB_REMUX
+    job.cost = sum(get_preset(fmt).cpu_cost for fmt in encoded)
+    log(f"    执行转换命令: {' '.join(job.cmd)}")
+    return job
+
+
+def _finish_job(job: _ConversionJob, code: int, stderr_tail: str, log: LogFunc) -> list[str]:
+    """Move in-place outputs into place; returns the final paths produced."""
     if code == 0:
-        if stdout:
-            log(f"    FFmpeg输出: {stdout}")
-        return True
-    log(f"    FFmpeg错误: {stderr}")
-    return False
+        for output_path, target_path in job.outputs:
+            if output_path != target_path:
+                os.replace(output_path, target_path)
+        return job.ready + [target for _, target in job.outputs]
+    log(f"    FFmpeg错误: {stderr_tail}")
+    for output_path, target_path in job.outputs:
+        if output_path != target_path and os.path.exists(output_path):
+            os.remove(output_path)
+    return []
+
+
+def _run_job(job: _ConversionJob, log: LogFunc, progress: ProgressFunc | None) -> list[str]:
+    if job.cmd is None:
+        return job.ready
+    with get_resource_manager().lease(job.kind, job.cost) as lease:
+        cmd = lease.apply_threads(job.cmd, [out for out, _ in job.outputs])
+        code, stderr_tail = _run_ffmpeg(cmd, job.duration, progress, lease)
+    return _finish_job(job, code, stderr_tail, log)
+
+
+def convert_audio_outputs(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> list[str]:
+    """Convert one audio file to several (format, path) targets in a single ffmpeg run.
+
+    Returns the target paths produced; empty if the conversion failed.
+    """
+    return _run_job(_prepare_audio_job(source_path, targets, ffmpeg_exe, log), log, progress)
+
+
+def convert_video_outputs(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> list[str]:
+    return _run_job(_prepare_video_job(source_path, targets, ffmpeg_exe, log), log, progress)
+
+
+def convert_audio_file(
+    source_path: str,
+    target_path: str,
+    target_format: str,
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> bool:
+    return bool(convert_audio_outputs(source_path, [(target_format, target_path)], ffmpeg_exe, log, progress))
 
 
 def convert_video_file(
@@ -221,76 +491,261 @@ def convert_video_file(
     target_format: str,
     ffmpeg_exe: str | None,
     log: LogFunc,
+    progress: ProgressFunc | None = None,
 ) -> bool:
-    if not os.path.exists(source_path):
-        log(f"    错误: 源文件不存在: {source_path}")
-        return False
+    return bool(convert_video_outputs(source_path, [(target_format, target_path)], ffmpeg_exe, log, progress))
+
+
+# ── asyncio conversion path ──────────────────────────────────
+
+async def _run_ffmpeg_async(
+    cmd: list[str],
+    duration: float | None = None,
+    on_progress: ProgressFunc | None = None,
+    lease: Lease | None = None,
+) -> tuple[int, str]:
+    """asyncio counterpart of _run_ffmpeg; never blocks the running loop."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_with_progress_args(cmd),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            startupinfo=get_startupinfo(),
+            **(lease.popen_kwargs() if lease else {}),
+        )
+    except Exception as error:
+        return 1, str(error)
+    if lease:
+        lease.apply_to_process(proc.pid)
+
+    tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def drain_stderr():
+        async for raw in proc.stderr:
+            tail.append(raw.decode("utf-8", "replace").rstrip())
+
+    reader = asyncio.ensure_future(drain_stderr())
+    parser = _ProgressParser(duration, on_progress)
+    try:
+        async for raw in proc.stdout:
+            parser.feed(raw.decode("utf-8", "replace"))
+        code = await proc.wait()
+        await reader
+    except BaseException:
+        reader.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    return code, "\n".join(tail)
+
+
+async def _run_job_async(job: _ConversionJob, log: LogFunc, progress: ProgressFunc | None) -> list[str]:
+    if job.cmd is None:
+        return job.ready
+    async with get_resource_manager().lease_async(job.kind, job.cost) as lease:
+        cmd = lease.apply_threads(job.cmd, [out for out, _ in job.outputs])
+        code, stderr_tail = await _run_ffmpeg_async(cmd, job.duration, progress, lease)
+    return _finish_job(job, code, stderr_tail, log)
+
+
+async def convert_audio_outputs_async(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> list[str]:
+    job = await asyncio.to_thread(_prepare_audio_job, source_path, targets, ffmpeg_exe, log)
+    return await _run_job_async(job, log, progress)
+
+
+async def convert_video_outputs_async(
+    source_path: str,
+    targets: list[tuple[str, str]],
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> list[str]:
+    job = await asyncio.to_thread(_prepare_video_job, source_path, targets, ffmpeg_exe, log)
+    return await _run_job_async(job, log, progress)
+
+
+async def convert_audio_file_async(
+    source_path: str,
+    target_path: str,
+    target_format: str,
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> bool:
+    return bool(await convert_audio_outputs_async(source_path, [(target_format, target_path)], ffmpeg_exe, log, progress))
+
+
+async def convert_video_file_async(
+    source_path: str,
+    target_path: str,
+    target_format: str,
+    ffmpeg_exe: str | None,
+    log: LogFunc,
+    progress: ProgressFunc | None = None,
+) -> bool:
+    return bool(await convert_video_outputs_async(source_path, [(target_format, target_path)], ffmpeg_exe, log, progress))
+
+
+def default_conversion_concurrency() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+class AsyncConverter:
+    """Converts files in the background on the running event loop.
+
+    submit() returns immediately; at most `concurrency` ffmpeg processes run at
+    once. Used to overlap conversion with ongoing downloads — call drain() at
+    the end to wait for everything and collect the converted paths.
+    """
+
+    def __init__(
+        self,
+        audio_format: str | None,
+        video_format: str | None,
+        ffmpeg_exe: str,
+        log: LogFunc,
+        progress: FileProgressFunc | None = None,
+        concurrency: int | None = None,
+        on_file_done: FileDoneFunc | None = None,
+    ):
+        self.audio_format = audio_format
+        self.video_format = video_format
+        self.ffmpeg_exe = ffmpeg_exe
+        self.log = log
+        self.progress = progress
+        self.on_file_done = on_file_done
+        self._semaphore = asyncio.Semaphore(concurrency or default_conversion_concurrency())
+        self._tasks: list[asyncio.Task] = []
+
+    def submit(self, path: Path) -> None:
+        self._tasks.append(asyncio.ensure_future(self._convert_and_report(Path(path))))
+
+    async def _convert_and_report(self, path: Path) -> list[str]:
+        result = await self._convert(path)
+        if self.on_file_done:
+            done = self.on_file_done(str(path), result)
+            if done is not None:
+                await done
+        return result
+
+    async def _convert(self, path: Path) -> list[str]:
+        ext = path.suffix.lower()
+        if self.audio_format and ext in _AUDIO_EXTS:
+            fmt, convert = self.audio_format, convert_audio_outputs_async
+        elif self.video_format and ext in _VIDEO_EXTS:
+            fmt, convert = self.video_format, convert_video_outputs_async
+        else:
+            return []
+        async with self._semaphore:
+            if not path.exists():
+                return []
+            self.log(f"    Converting {path.name} to {fmt}...")
+            targets = conversion_targets(path, fmt)
+            produced = await convert(str(path), targets, self.ffmpeg_exe, self.log, _file_progress(self.progress, str(path)))
+        for target in produced:
+            self.log(f"    Done: {target}")
+        return produced
+
+    async def drain(self) -> list[str]:
+        """Wait for every submitted conversion; returns converted paths in submit order."""
+        tasks, self._tasks = self._tasks, []
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        converted = [target for produced in results for target in produced]
+        if converted:
+            self.log(f"Conversion complete: {len(converted)} file(s) converted")
+        else:
+            self.log("No files were converted")
+        return converted
+
+
+async def convert_file_list_async(
+    files: list[Path],
+    audio_format: str | None,
+    video_format: str | None,
+    ffmpeg_exe: str,
+    log: LogFunc,
+    progress: FileProgressFunc | None = None,
+    concurrency: int | None = None,
+    on_file_done: FileDoneFunc | None = None,
+) -> list[str]:
+    """Async convert_file_list: files are converted concurrently, bounded by `concurrency`."""
     if not ffmpeg_exe:
-        log("    错误: FFmpeg不可用")
-        return False
+        log("    Error: FFmpeg not available, conversion skipped")
+        return []
+    if not files:
+        return []
 
-    target_format = target_format.lower()
-    if target_format in ["mp4", "mov", "mkv"]:
-        cmd = [ffmpeg_exe, "-y", "-i", source_path, "-c", "copy", target_path]
-    elif target_format == "avi":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:v",
-            "libx264",
-            "-c:a",
-            "aac",
-            target_path,
-        ]
-    elif target_format == "wmv":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:v",
-            "wmv2",
-            "-c:a",
-            "wmav2",
-            target_path,
-        ]
-    elif target_format == "flv":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:v",
-            "flv",
-            "-c:a",
-            "aac",
-            target_path,
-        ]
-    elif target_format == "webm":
-        cmd = [
-            ffmpeg_exe,
-            "-y",
-            "-i",
-            source_path,
-            "-c:v",
-            "libvpx-vp9",
-            "-c:a",
-            "libopus",
-            target_path,
-        ]
-    else:
-        cmd = [ffmpeg_exe, "-y", "-i", source_path, "-c", "copy", target_path]
+    await asyncio.to_thread(
+        probe_many,
+        [str(p) for p in files if Path(p).exists()],
+        resolve_ffprobe_executable(ffmpeg_exe),
+    )
+    converter = AsyncConverter(audio_format, video_format, ffmpeg_exe, log, progress, concurrency, on_file_done)
+    for path in files:
+        converter.submit(Path(path))
+    return await converter.drain()
 
-    log(f"    执行转换命令: {' '.join(cmd)}")
-    code, stdout, stderr = _run_subprocess(cmd)
-    if code == 0:
-        if stdout:
-            log(f"    FFmpeg输出: {stdout}")
-        return True
-    log(f"    FFmpeg错误: {stderr}")
-    return False
+
+def collect_convertible_files(
+    directory: str | None,
+    files: list[str] | None,
+    audio_format: str | None,
+    video_format: str | None,
+) -> list[Path]:
+    """Files a batch conversion would touch: explicit files plus a recursive directory scan.
+
+    Only extensions the requested formats apply to are kept; order is stable
+    and duplicates are dropped.
+    """
+    exts = (_AUDIO_EXTS if audio_format else ()) + (_VIDEO_EXTS if video_format else ())
+    found: dict[str, Path] = {}
+    for f in files or []:
+        p = Path(f)
+        if p.suffix.lower() in exts and p.is_file():
+            found.setdefault(str(p.resolve()), p)
+    if directory:
+        for p in sorted(Path(directory).rglob("*")):
+            if p.suffix.lower() in exts and p.is_file():
+                found.setdefault(str(p.resolve()), p)
+    return list(found.values())
+
+
+def _file_progress(progress: FileProgressFunc | None, file_path: str) -> ProgressFunc | None:
+    if progress is None:
+        return None
+    name = os.path.basename(file_path)
+    return lambda percent, speed: progress(name, percent, speed)
+
+
+def _pending_targets(
+    file_path: str,
+    formats: str,
+    result_files: list[str],
+    log: LogFunc,
+) -> list[tuple[str, str]]:
+    """conversion_targets minus outputs that already exist (those are recorded as results)."""
+    targets = []
+    for fmt, converted_path in conversion_targets(file_path, formats):
+        if converted_path != file_path and os.path.exists(converted_path):
+            log(f"    跳过 {os.path.basename(file_path)} → {fmt} (目标文件已存在)")
+            result_files.append(converted_path)
+        else:
+            targets.append((fmt, converted_path))
+    return targets
 
 
 def convert_downloaded_files(
@@ -299,60 +754,37 @@ def convert_downloaded_files(
     video_format: str,
     ffmpeg_exe: str | None,
     log: LogFunc,
+    progress: FileProgressFunc | None = None,
 ) -> list[str]:
     result_files: list[str] = []
     try:
         log(f"准备转换 {len(downloaded_files)} 个下载的文件")
         converted_count = 0
-
-        if audio_format and audio_format != "keep original":
-            for file_path in downloaded_files:
-                if not file_path.endswith((".m4a", ".mp4")):
-                    result_files.append(file_path)
-                    continue
-                converted_path = os.path.splitext(file_path)[0] + f".{audio_format}"
-                if os.path.exists(converted_path):
-                    log(f"    跳过 {os.path.basename(file_path)} (目标文件已存在)")
-                    result_files.append(converted_path)
-                    continue
-                if convert_audio_file(
-                    file_path,
-                    converted_path,
-                    audio_format,
-                    ffmpeg_exe,
-                    log,
-                ):
-                    converted_count += 1
-                    log(f"    成功转换 {os.path.basename(file_path)} 为 {audio_format}")
-                    result_files.append(converted_path)
-                    try:
-                        os.remove(file_path)
-                        log(f"    已删除原文件 {os.path.basename(file_path)}")
-                    except Exception as error:
-                        log(f"    删除原文件失败 {os.path.basename(file_path)}: {str(error)}")
-                else:
-                    log(f"    转换失败 {os.path.basename(file_path)}")
-                    result_files.append(file_path)
-
-        if video_format and video_format != "keep original":
-            for file_path in list(result_files):
-                if not file_path.endswith((".mov", ".mp4")):
+        probe_many(downloaded_files, resolve_ffprobe_executable(ffmpeg_exe))
+
+        for kind, target_format, exts, convert in (
+            ("audio", audio_format, (".m4a", ".mp4"), convert_audio_outputs),
+            ("video", video_format, (".mov", ".mp4"), convert_video_outputs),
+        ):
+            if not target_format or target_format == "keep original":
+                continue
+            # video conversion runs on whatever the audio pass left behind
+            sources = downloaded_files if kind == "audio" else list(result_files)
+            for file_path in sources:
+                if not file_path.endswith(exts):
+                    if kind == "audio":
+                        result_files.append(file_path)
                     continue
-                converted_path = os.path.splitext(file_path)[0] + f".{video_format}"
-                if os.path.exists(converted_path):
-                    log(f"    跳过 {os.path.basename(file_path)} (目标文件已存在)")
-                    result_files.append(converted_path)
+                targets = _pending_targets(file_path, target_format, result_files, log)
+                if not targets:
                     continue
-                if convert_video_file(
-                    file_path,
-                    converted_path,
-                    video_format,
-                    ffmpeg_exe,
-                    log,
-                ):
+                produced = convert(file_path, targets, ffmpeg_exe, log, _file_progress(progress, file_path))
+                if produced:
                     converted_count += 1
-                    log(f"    成功转换 {os.path.basename(file_path)} 为 {video_format}")
-                    result_files.append(converted_path)
+                    log(f"    成功转换 {os.path.basename(file_path)} 为 {target_format}")
+                    result_files.extend(produced)
+                    if file_path in produced:
+                        continue
                     try:
                         os.remove(file_path)
                         log(f"    已删除原文件 {os.path.basename(file_path)}")
@@ -362,6 +794,8 @@ def convert_downloaded_files(
                     log(f"    转换失败 {os.path.basename(file_path)}")
                     result_files.append(file_path)
         log(f"格式转换完成，共转换 {converted_count} 个文件")
+    except InterruptedError:
+        raise
     except Exception as error:
         log(f"格式转换过程中发生错误: {str(error)}")
     return result_files
@@ -373,6 +807,7 @@ def convert_directory(
     video_format: str | None,
     ffmpeg_exe: str | None,
     log: LogFunc,
+    progress: FileProgressFunc | None = None,
 ) -> list[str]:
     """扫描目录下所有 .m4a/.m4v/.mp4/.mov 文件，批量转换格式。
 
@@ -382,6 +817,7 @@ def convert_directory(
         video_format: 目标视频格式（如 "mp4", "mkv"），None=不转。
         ffmpeg_exe: FFmpeg 可执行文件路径。
         log: 日志回调。
+        progress: 单文件转换进度回调 (文件名, 百分比, 速度)。
 
     Returns:
         转换后的文件路径列表。
@@ -404,7 +840,14 @@ def convert_directory(
         log("    未找到需要转换的文件")
         return []
 
-    return convert_downloaded_files(files, audio_format or "keep original", video_format or "keep original", ffmpeg_exe, log)
+    return convert_downloaded_files(
+        files,
+        audio_format or "keep original",
+        video_format or "keep original",
+        ffmpeg_exe,
+        log,
+        progress,
+    )
 
 
 def convert_file_list(
@@ -413,6 +856,7 @@ def convert_file_list(
     video_format: str | None,
     ffmpeg_exe: str,
     log: LogFunc,
+    progress: FileProgressFunc | None = None,
 ) -> list[str]:
     """Convert only files from current download task, not the whole directory."""
     if not ffmpeg_exe:
@@ -423,27 +867,31 @@ def convert_file_list(
         return []
 
     converted: list[str] = []
-    audio_exts = (".m4a", ".mp4")
-    video_exts = (".mp4", ".mov", ".m4v")
+    audio_exts = _AUDIO_EXTS
+    video_exts = _VIDEO_EXTS
+    probe_many([str(p) for p in files if p.exists()], resolve_ffprobe_executable(ffmpeg_exe))
 
     for path in files:
         if not path.exists():
             continue
         ext = path.suffix.lower()
         if audio_format and ext in audio_exts:
-            log(f"    Converting {path.name} to {audio_format}...")
-            target = str(path.with_suffix(f".{audio_format}"))
-            ok = convert_audio_file(str(path), target, audio_format, ffmpeg_exe, log)
-            if ok:
-                converted.append(target)
-                log(f"    Done: {target}")
+            target_format, convert = audio_format, convert_audio_outputs
         elif video_format and ext in video_exts:
-            log(f"    Converting {path.name} to {video_format}...")
-            target = str(path.with_suffix(f".{video_format}"))
-            ok = convert_video_file(str(path), target, video_format, ffmpeg_exe, log)
-            if ok:
-                converted.append(target)
-                log(f"    Done: {target}")
+            target_format, convert = video_format, convert_video_outputs
+        else:
+            continue
+        log(f"    Converting {path.name} to {target_format}...")
+        produced = convert(
+            str(path),
+            conversion_targets(path, target_format),
+            ffmpeg_exe,
+            log,
+            _file_progress(progress, str(path)),
+        )
+        for target in produced:
+            converted.append(target)
+            log(f"    Done: {target}")
 
     if converted:
         log(f"Conversion complete: {len(converted)} file(s) converted")
@@ -12,10 +12,12 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
+import sqlite3
 import sys
 import traceback
 from pathlib import Path
-from typing import Callable
+from typing import Awaitable, Callable
 
 from gamdl.api import AppleMusicApi
 from gamdl.downloader import (
@@ -39,6 +41,11 @@ from gamdl.interface import (
     SyncedLyricsFormat,
     UploadedVideoQuality,
 )
+from gamdl.interface.exceptions import GamdlInterfaceFlatFilterExcludedError
+
+from amdl.catalog import CatalogPlanner, discard_ids, iter_download_items, prefetch_catalog
+from amdl.library_index import LibraryIndex, TrackEntry, default_index_path
+from amdl.url_source import UrlSource
 
 # ── type aliases ──────────────────────────────────────────────
 LogCallback = Callable[[str], None]
@@ -80,6 +87,60 @@ def _setup_logger(
     return logger
 
 
+# ── library index ────────────────────────────────────────────
+async def _index_download(library: LibraryIndex | None, item, logger: logging.Logger) -> None:
+    """Record a downloaded (or already present) file in the library index."""
+    meta = item.media.media_metadata
+    if library is None or not isinstance(meta, dict) or not meta.get("id"):
+        return
+    try:
+        entry = await asyncio.to_thread(TrackEntry.from_file, item.final_path)
+    except OSError as e:
+        logger.warning(f"Could not add {item.final_path} to the library index: {e}")
+        return
+    library.add(meta["id"], entry)
+
+
+def _index_converted(library: LibraryIndex, logger: logging.Logger) -> Callable[[str, list[str]], Awaitable[None]]:
+    """Converter callback: keep index rows in step with converted files.
+
+    A file converted in place is re-hashed; rows of a source that is gone
+    move to its first converted file. A source kept next to its
+    conversions keeps its rows.
+    """
+
+    async def on_file_done(source: str, produced: list[str]) -> None:
+        if not produced:
+            return
+        ids = library.ids_at(source)
+        if not ids:
+            return
+        source_abs = os.path.abspath(source)
+        if any(os.path.abspath(p) == source_abs for p in produced):
+            target = source
+            current = library.get(ids[0])
+            try:
+                st = os.stat(source)
+            except OSError:
+                return
+            if current is not None and (current.size, current.mtime_ns) == (st.st_size, st.st_mtime_ns):
+                return  # already in the target format, left untouched
+        elif os.path.exists(source):
+            return
+        else:
+            target = produced[0]
+        # Hashing the converted file off the loop keeps the other conversions running
+        try:
+            entry = await asyncio.to_thread(TrackEntry.from_file, target)
+        except OSError as e:
+            logger.warning(f"Could not add {target} to the library index: {e}")
+            return
+        for media_id in ids:
+            library.add(media_id, entry)
+
+    return on_file_done
+
+
 # ── main download orchestrator ───────────────────────────────
 def download_urls(
     *,
@@ -106,6 +167,7 @@ def download_urls(
     # optional – conversion
     audio_format: str | None = None,
     video_format: str | None = None,
+    conversion_concurrency: int | None = None,
     # optional – templates
     template_folder_album: str = "{album_artist}/{album}",
     template_folder_compilation: str = "Compilations/{album}",
@@ -124,6 +186,7 @@ def download_urls(
     no_synced_lyrics: bool = False,
     disable_music_video_skip: bool = False,
     read_urls_as_txt: bool = False,
+    library_index: bool = False,
     no_exceptions: bool = True,
     # optional – API
     language: str = "en-US",
@@ -132,55 +195,73 @@ def download_urls(
     log_level: str = "INFO",
     # optional – progress tracking
     progress_callback: Callable[[int, int], None] | None = None,
+    conversion_progress_callback: Callable[[str, float, str | None], None] | None = None,
 ) -> int:
     """Download tracks from Apple Music URLs via gamdl.
 
     Returns the number of errors encountered (0 = success).
 
+    With library_index, tracks listed in the output folder's library index
+    are skipped before any per-track request, and every download is added
+    to the index (see amdl.library_index).
+
     Note: mp4decrypt_path, mp4box_path, and remux_mode are no longer needed
     as gamdl handles everything internally.
     """
-    return asyncio.run(
-        _download_urls_async(
-            urls=urls,
-            cookies_path=cookies_path,
-            output_path=output_path,
-            temp_path=temp_path,
-            wvd_path=wvd_path,
-            nm3u8dlre_path=nm3u8dlre_path,
-            ffmpeg_path=ffmpeg_path,
-            download_mode=download_mode,
-            codec_song=codec_song,
-            codec_music_video=codec_music_video,
-            quality_post=quality_post,
-            synced_lyrics_format=synced_lyrics_format,
-            cover_format=cover_format,
-            cover_size=cover_size,
-            truncate=truncate,
-            audio_format=audio_format,
-            video_format=video_format,
-            template_folder_album=template_folder_album,
-            template_folder_compilation=template_folder_compilation,
-            template_file_single_disc=template_file_single_disc,
-            template_file_multi_disc=template_file_multi_disc,
-            template_folder_no_album=template_folder_no_album,
-            template_file_no_album=template_file_no_album,
-            template_file_playlist=template_file_playlist,
-            template_date=template_date,
-            exclude_tags=exclude_tags,
-            overwrite=overwrite,
-            save_cover=save_cover,
-            save_playlist=save_playlist,
-            synced_lyrics_only=synced_lyrics_only,
-            no_synced_lyrics=no_synced_lyrics,
-            read_urls_as_txt=read_urls_as_txt,
-            no_exceptions=no_exceptions,
-            language=language,
-            log_callback=log_callback,
-            log_level=log_level,
-            progress_callback=progress_callback,
+    library = None
+    if library_index:
+        try:
+            library = LibraryIndex(default_index_path(output_path))
+        except (OSError, sqlite3.Error) as e:
+            logging.getLogger("amdl.core").warning(f"Library index unavailable, continuing without it: {e}")
+    try:
+        return asyncio.run(
+            _download_urls_async(
+                urls=urls,
+                cookies_path=cookies_path,
+                output_path=output_path,
+                temp_path=temp_path,
+                wvd_path=wvd_path,
+                nm3u8dlre_path=nm3u8dlre_path,
+                ffmpeg_path=ffmpeg_path,
+                download_mode=download_mode,
+                codec_song=codec_song,
+                codec_music_video=codec_music_video,
+                quality_post=quality_post,
+                synced_lyrics_format=synced_lyrics_format,
+                cover_format=cover_format,
+                cover_size=cover_size,
+                truncate=truncate,
+                audio_format=audio_format,
+                video_format=video_format,
+                conversion_concurrency=conversion_concurrency,
+                template_folder_album=template_folder_album,
+                template_folder_compilation=template_folder_compilation,
+                template_file_single_disc=template_file_single_disc,
+                template_file_multi_disc=template_file_multi_disc,
+                template_folder_no_album=template_folder_no_album,
+                template_file_no_album=template_file_no_album,
+                template_file_playlist=template_file_playlist,
+                template_date=template_date,
+                exclude_tags=exclude_tags,
+                overwrite=overwrite,
+                save_cover=save_cover,
+                save_playlist=save_playlist,
+                synced_lyrics_only=synced_lyrics_only,
+                no_synced_lyrics=no_synced_lyrics,
+                read_urls_as_txt=read_urls_as_txt,
+                no_exceptions=no_exceptions,
+                language=language,
+                log_callback=log_callback,
+                log_level=log_level,
+                progress_callback=progress_callback,
+                conversion_progress_callback=conversion_progress_callback,
+                library=library,
+            )
         )
-    )
+    finally:
+        if library is not None:
+            library.close()
 
 
 async def _download_urls_async(
@@ -202,6 +283,7 @@ async def _download_urls_async(
     truncate: int | None = None,
     audio_format: str | None = None,
     video_format: str | None = None,
+    conversion_concurrency: int | None = None,
     template_folder_album: str = "{album_artist}/{album}",
     template_folder_compilation: str = "Compilations/{album}",
     template_file_single_disc: str = "{track:02d} {title}",
@@ -222,6 +304,8 @@ async def _download_urls_async(
     log_callback: LogCallback | None = None,
     log_level: str = "INFO",
     progress_callback: Callable[[int, int], None] | None = None,
+    conversion_progress_callback: Callable[[str, float, str | None], None] | None = None,
+    library: LibraryIndex | None = None,
 ) -> int:
     """Async implementation of download_urls using gamdl embedding API."""
     logger = _setup_logger("amdl.core", log_level, log_callback)
@@ -230,16 +314,8 @@ async def _download_urls_async(
     temp_path = Path(temp_path)
     output_path = Path(output_path)
 
-    # ── expand txt files ─────────────────────────────────
-    if read_urls_as_txt:
-        expanded: list[str] = []
-        for u in urls:
-            p = Path(u)
-            if p.exists():
-                expanded.extend(p.read_text(encoding="utf-8").splitlines())
-            else:
-                expanded.append(u)
-        urls = expanded
+    # ── URL source: txt files read lazily, duplicates skipped ──
+    url_source = UrlSource(urls, read_files=read_urls_as_txt)
 
     # ── parse exclude_tags ───────────────────────────────
     exclude_tags_list: list[str] = []
@@ -282,10 +358,13 @@ async def _download_urls_async(
         quality=quality_post,
     )
 
+    # Owned tracks are dropped as soon as their catalog metadata is known
+    skip_owned = library is not None and not overwrite
     interface = AppleMusicInterface(
         song=song_interface,
         music_video=music_video_interface,
         uploaded_video=uploaded_video_interface,
+        flat_filter_function=library.flat_filter if skip_owned else None,
     )
 
     # ── build gamdl downloader stack ─────────────────────
@@ -348,25 +427,74 @@ async def _download_urls_async(
     )
 
     # ── collect all download items first for progress ────
+    # URLs are canonicalised and de-duplicated as they stream in; each window
+    # of songs and music videos is looked up in one batch per type
+    planner = CatalogPlanner(url_source)
+    owned_urls = 0
     all_items: list = []
     error_count = 0
-    for url in urls:
-        logger.info(f'Parsing "{url}"')
-        try:
-            async for item in downloader.get_download_item_from_url(url):
-                all_items.append(item)
-        except Exception as e:
-            error_count += 1
-            logger.error(f'Failed to parse "{url}": {e}', exc_info=not no_exceptions)
-            continue
+    for window in planner.windows():
+        if skip_owned:
+            owned_ids = {ref.id for _, ref in window if ref is not None and library.is_owned(ref.id)}
+            kept = discard_ids(window, owned_ids)
+            owned_urls += len(window) - len(kept)
+            window = kept
+        prefetched = await prefetch_catalog(apple_music_api, window)
+        if prefetched:
+            logger.debug(f"Prefetched catalog metadata for {len(prefetched)} item(s)")
+        for url, ref in window:
+            logger.info(f'Parsing "{url}"')
+            try:
+                async for item in iter_download_items(downloader, url, ref, prefetched):
+                    all_items.append(item)
+            except Exception as e:
+                error_count += 1
+                logger.error(f'Failed to parse "{url}": {e}', exc_info=not no_exceptions)
+                continue
+
+    duplicates = url_source.duplicates + planner.duplicates
+    if duplicates:
+        logger.info(f"Skipped {duplicates} duplicate URL(s)")
+    if planner.covered:
+        logger.info(f"Skipped {planner.covered} song URL(s) whose album is also listed")
+    if owned_urls:
+        logger.info(f"Skipped {owned_urls} song/music video URL(s) already in the library index")
 
     total_tracks = len(all_items) if all_items else 1
     error_count = 0
     completed = 0
-    completed_files: list[str] = []
+    # id() of skipped media, for the summary only: gamdl yields a track's media
+    # object twice and both yields are part of total_tracks
+    owned: set[int] = set()
+
+    # ── format conversion runs alongside the downloads ──
+    converter = None
+    if audio_format or video_format:
+        from amdl.converter import AsyncConverter, resolve_ffmpeg_executable
+
+        exe = resolve_ffmpeg_executable(ffmpeg_path)
+        if exe:
+            converter = AsyncConverter(
+                audio_format,
+                video_format,
+                exe,
+                logger.info if log_callback else (lambda m: None),
+                conversion_progress_callback,
+                conversion_concurrency,
+                on_file_done=_index_converted(library, logger) if library is not None else None,
+            )
+        else:
+            logger.error("FFmpeg not found — format conversion skipped")
 
     # ── download each item ───────────────────────────────
     for item in all_items:
+        if isinstance(item.media.error, GamdlInterfaceFlatFilterExcludedError):
+            owned.add(id(item.media))
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total_tracks)
+            continue
+
         if item.media.error:
             error_count += 1
             meta = item.media.media_metadata
@@ -384,37 +512,36 @@ async def _download_urls_async(
         try:
             await downloader.download(item)
             completed += 1
-            completed_files.append(str(item.final_path))
+            await _index_download(library, item, logger)
+            if converter:
+                converter.submit(Path(item.final_path))
             if progress_callback:
                 progress_callback(completed, total_tracks)
         except GamdlDownloaderMediaFileExistsError:        
             completed += 1
             logger.info(f'Skipped "{title}": file already exists')
+            await _index_download(library, item, logger)
             if progress_callback:
                 progress_callback(completed, total_tracks)
+        except InterruptedError:
+            raise
         except Exception as e:
             error_count += 1
             tb = traceback.format_exc()
             logger.error(f'Failed to download "{title}": {e}')
             logger.error(f'Traceback:\n{tb}')
 
-    # ── format conversion (post-processing) ────────────
-    if audio_format or video_format:
-        if completed_files:
-            try:
-                from amdl.converter import convert_file_list, resolve_ffmpeg_executable
-                exe = resolve_ffmpeg_executable(ffmpeg_path)
-                if exe:
-                    logger.info("Starting format conversion...")
-                    convert_file_list(
-                        [Path(p) for p in completed_files],
-                        audio_format,
-                        video_format,
-                        exe,
-                        logger.info if log_callback else (lambda m: None),
-                    )
-            except Exception as e:
-                logger.error(f"Format conversion failed: {e}", exc_info=not no_exceptions)
+    # ── wait for outstanding conversions ───────────────
+    if converter:
+        try:
+            logger.info("Finishing format conversion...")
+            await converter.drain()
+        except InterruptedError:
+            raise
+        except Exception as e:
+            logger.error(f"Format conversion failed: {e}", exc_info=not no_exceptions)
 
+    if owned:
+        logger.info(f"Skipped {len(owned)} track(s) already in the library index")
     logger.info(f"Done ({error_count} error(s))")
     return error_count
\ No newline at end of file
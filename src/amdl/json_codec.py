@@ -0,0 +1,32 @@
+"""JSON encoding for the hot API paths.
+
+Uses orjson when it is installed (`pip install applemusic-dl[fast]`), and
+the standard library otherwise. Both produce compact UTF-8 JSON.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that renders with dumps(); also accepts pre-encoded bytes."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
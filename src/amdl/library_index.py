@@ -0,0 +1,247 @@
+"""Persistent index of the tracks already in a download library.
+
+The index is an SQLite database in the library root (`.amdl-library.db`)
+mapping catalog IDs to the downloaded file: path, codec, size, mtime and a
+content hash. A row is written after every successful download.
+
+The IDs are loaded into memory once per run, and gamdl consults
+`flat_filter` as soon as a track's catalog metadata is known. That is
+before cover, lyrics or stream lookups, so re-syncing a playlist whose
+tracks are all owned costs only the playlist's catalog call. An indexed
+track counts as owned only while its file exists (one stat per hit), so
+deleted files are downloaded again.
+
+Files moved or added by hand are not noticed until `amdl --reindex`,
+which rebuilds the index from the `cnID` tags of the library's MP4 files:
+
+- new and changed files (size or mtime differ) are tagged and hashed
+- unchanged files keep their row without being read
+- rows whose file is gone are removed; other rows (e.g. files converted to
+  formats without a `cnID` tag) are kept
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from mutagen import MutagenError
+from mutagen.mp4 import MP4
+
+logger = logging.getLogger("amdl.library")
+
+LIBRARY_INDEX_NAME = ".amdl-library.db"
+INDEXED_SUFFIXES = (".m4a", ".m4v", ".mp4")
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    codec TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_path_idx ON tracks(path);
+"""
+
+
+def default_index_path(library_root: Path | str) -> Path:
+    return Path(library_root) / LIBRARY_INDEX_NAME
+
+
+def file_hash(path: Path | str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_tags(path: Path | str) -> tuple[str | None, str | None]:
+    """(catalog ID from the cnID tag, codec) of an MP4 file; (None, None) if unreadable."""
+    try:
+        mp4 = MP4(path)
+    except (MutagenError, OSError):
+        return None, None
+    title_id = mp4.tags.get("cnID") if mp4.tags else None
+    if isinstance(title_id, (list, tuple)):
+        title_id = title_id[0] if title_id else None
+    codec = getattr(mp4.info, "codec", None)
+    return (str(title_id) if title_id is not None else None), codec
+
+
+@dataclass(frozen=True)
+class TrackEntry:
+    path: str
+    codec: str | None
+    size: int
+    mtime_ns: int
+    hash: str
+
+    @classmethod
+    def from_file(cls, path: Path | str, codec: str | None = None) -> TrackEntry:
+        """Stat and hash `path`. Blocking; reads the whole file."""
+        path = Path(path).absolute()
+        st = path.stat()
+        if codec is None:
+            codec = read_tags(path)[1] or path.suffix.lstrip(".").lower()
+        return cls(str(path), codec, st.st_size, st.st_mtime_ns, file_hash(path))
+
+
+@dataclass
+class ReindexResult:
+    indexed: int = 0  # new or changed files, tagged and hashed
+    unchanged: int = 0
+    untagged: int = 0  # MP4 files without a cnID tag
+    removed: int = 0  # rows whose file is gone
+
+    def __str__(self) -> str:
+        return (
+            f"{self.indexed} indexed, {self.unchanged} unchanged, "
+            f"{self.untagged} without catalog ID, {self.removed} removed"
+        )
+
+
+def _library_files(root: Path) -> Iterator[Path]:
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(INDEXED_SUFFIXES):
+                yield Path(dirpath) / name
+
+
+def _scan_file(path: Path) -> tuple[str | None, TrackEntry | None]:
+    title_id, codec = read_tags(path)
+    if title_id is None:
+        return None, None
+    try:
+        return title_id, TrackEntry.from_file(path, codec)
+    except OSError:
+        return None, None
+
+
+class LibraryIndex:
+    """One connection to a library's index. Use from a single thread (one per download run)."""
+
+    def __init__(self, path: Path | str, timeout: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # WAL: concurrent download workers append to the same index
+        self._conn = sqlite3.connect(self.path, timeout=timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._owned: set[str] | None = None
+
+    def __enter__(self) -> LibraryIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ── lookups ───────────────────────────────────────────────
+
+    def owned_ids(self) -> set[str]:
+        """IDs of all indexed tracks, loaded on first use."""
+        if self._owned is None:
+            self._owned = {row[0] for row in self._conn.execute("SELECT id FROM tracks")}
+        return self._owned
+
+    def is_owned(self, media_id: str) -> bool:
+        """True if `media_id` is indexed and its file is still there."""
+        if media_id not in self.owned_ids():
+            return False
+        entry = self.get(media_id)
+        if entry is not None and os.path.exists(entry.path):
+            return True
+        self._owned.discard(media_id)  # deleted by hand: download it again
+        return False
+
+    def flat_filter(self, media_metadata: dict) -> str | None:
+        """gamdl flat_filter_function: exclude tracks that are already in the library."""
+        if self.is_owned(media_metadata["id"]):
+            return "Already in library index"
+        return None
+
+    def get(self, media_id: str) -> TrackEntry | None:
+        row = self._conn.execute(
+            "SELECT path, codec, size, mtime_ns, hash FROM tracks WHERE id = ?", (media_id,)
+        ).fetchone()
+        return TrackEntry(*row) if row else None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    # ── updates ───────────────────────────────────────────────
+
+    def add(self, media_id: str, entry: TrackEntry) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tracks (id, path, codec, size, mtime_ns, hash, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (media_id, entry.path, entry.codec, entry.size, entry.mtime_ns, entry.hash, time.time()),
+            )
+        if self._owned is not None:
+            self._owned.add(media_id)
+
+    def ids_at(self, path: Path | str) -> list[str]:
+        """IDs of the rows that point at `path`."""
+        path = str(Path(path).absolute())
+        return [row[0] for row in self._conn.execute("SELECT id FROM tracks WHERE path = ?", (path,))]
+
+    def reindex(self, library_root: Path | str, workers: int = 4) -> ReindexResult:
+        """Rebuild the index from the tags of the MP4 files under `library_root`."""
+        root = Path(library_root).absolute()
+        result = ReindexResult()
+        known = {
+            row[0]: row[1:]
+            for row in self._conn.execute("SELECT path, size, mtime_ns FROM tracks")
+        }
+
+        to_scan: list[Path] = []
+        for path in _library_files(root):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if known.get(str(path)) == (st.st_size, st.st_mtime_ns):
+                result.unchanged += 1
+            else:
+                to_scan.append(path)
+
+        # Reading and hashing are I/O bound and release the GIL
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            scanned = list(pool.map(_scan_file, to_scan))
+
+        now = time.time()
+        with self._conn:
+            for title_id, entry in scanned:
+                if entry is None:
+                    result.untagged += 1
+                    continue
+                # a retagged file must not stay listed under its old ID
+                self._conn.execute("DELETE FROM tracks WHERE path = ? AND id != ?", (entry.path, title_id))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tracks (id, path, codec, size, mtime_ns, hash, indexed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (title_id, entry.path, entry.codec, entry.size, entry.mtime_ns, entry.hash, now),
+                )
+                result.indexed += 1
+            gone = [(path,) for path in known if not os.path.exists(path)]
+            if gone:
+                result.removed = self._conn.executemany("DELETE FROM tracks WHERE path = ?", gone).rowcount
+        self._owned = None
+        logger.info(f"Reindexed {root}: {result}")
+        return result
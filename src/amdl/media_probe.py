@@ -0,0 +1,153 @@
+"""ffprobe-backed media introspection with a process-wide cache.
+
+Each file is probed once (JSON mode, streams + format). Results are cached by
+absolute path and invalidated when the file's size or mtime changes, so bulk
+conversions and repeated planning never re-probe unchanged files.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable
+
+from amdl.utils import get_startupinfo
+
+_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: str | None = None
+    channels: int | None = None
+    channel_layout: str | None = None
+    sample_rate: int | None = None
+    profile: str | None = None
+    attached_pic: bool = False
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    duration: float | None
+    streams: tuple[StreamInfo, ...]
+
+    @property
+    def audio(self) -> StreamInfo | None:
+        """First audio stream."""
+        return next((s for s in self.streams if s.codec_type == "audio"), None)
+
+    @property
+    def video(self) -> StreamInfo | None:
+        """First real video stream (cover art excluded)."""
+        return next((s for s in self.streams if s.codec_type == "video" and not s.attached_pic), None)
+
+    @property
+    def cover(self) -> StreamInfo | None:
+        """Embedded cover art (attached picture) stream."""
+        return next((s for s in self.streams if s.codec_type == "video" and s.attached_pic), None)
+
+
+_cache: OrderedDict[str, tuple[int, int, MediaInfo | None]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parse(path: str, data: dict) -> MediaInfo:
+    streams = []
+    for s in data.get("streams") or []:
+        sample_rate = s.get("sample_rate")
+        streams.append(StreamInfo(
+            index=int(s.get("index", len(streams))),
+            codec_type=s.get("codec_type", ""),
+            codec_name=s.get("codec_name"),
+            channels=s.get("channels"),
+            channel_layout=s.get("channel_layout"),
+            sample_rate=int(sample_rate) if sample_rate else None,
+            profile=s.get("profile"),
+            attached_pic=bool((s.get("disposition") or {}).get("attached_pic")),
+        ))
+    duration = (data.get("format") or {}).get("duration")
+    return MediaInfo(
+        path=path,
+        duration=float(duration) if duration else None,
+        streams=tuple(streams),
+    )
+
+
+def _run_ffprobe(path: str, ffprobe_exe: str) -> MediaInfo | None:
+    cmd = [
+        ffprobe_exe,
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
+        path,
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            timeout=30,
+            startupinfo=get_startupinfo(),
+        )
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return _parse(path, json.loads(result.stdout))
+    except (ValueError, TypeError):
+        return None
+
+
+def probe_media(path: str, ffprobe_exe: str | None) -> MediaInfo | None:
+    """Probe a file (cached). Returns None if ffprobe is unavailable or fails."""
+    if not ffprobe_exe:
+        return None
+    key = os.path.abspath(path)
+    try:
+        st = os.stat(key)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            _cache.move_to_end(key)
+            return hit[2]
+
+    info = _run_ffprobe(key, ffprobe_exe)
+    with _cache_lock:
+        _cache[key] = (st.st_size, st.st_mtime_ns, info)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return info
+
+
+def probe_many(
+    paths: Iterable[str],
+    ffprobe_exe: str | None,
+    max_workers: int | None = None,
+) -> dict[str, MediaInfo | None]:
+    """Probe many files in parallel, filling the cache. Returns {path: info}."""
+    paths = list(dict.fromkeys(str(p) for p in paths))
+    if not ffprobe_exe or not paths:
+        return {p: None for p in paths}
+    workers = max_workers or min(len(paths), (os.cpu_count() or 1) * 2, 16)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(zip(paths, pool.map(lambda p: probe_media(p, ffprobe_exe), paths)))
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,227 @@
+"""Conversion preset registry.
+
+A preset bundles everything the converter needs to produce one output: the
+container extension, encoder arguments, which source codecs can be stream
+copied instead, encoder limits and a rough relative CPU cost.
+
+Every historical format name (mp3, flac, m4a, mkv, ...) resolves to a
+built-in preset, so `audio_format` / `video_format` keep working unchanged.
+Deployments can add or override presets in settings.json:
+
+    "conversion_presets": {
+        "opus-96": {
+            "kind": "audio",
+            "extension": "opus",
+            "audio_args": ["-c:a", "libopus", "-b:a", "96k"],
+            "copy_audio_codecs": ["opus"],
+            "keeps_cover": false,
+            "cpu_cost": 0.8
+        }
+    }
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger("amdl.presets")
+
+PRESET_KINDS = ("audio", "video")
+_EXTENSION_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+@dataclass(frozen=True)
+class ConversionPreset:
+    name: str
+    kind: str  # "audio" or "video"
+    extension: str
+    audio_args: tuple[str, ...] = ()
+    video_args: tuple[str, ...] = ()
+    # source codecs the container takes as stream copy; None = any codec
+    copy_audio_codecs: frozenset[str] | None = frozenset()
+    copy_video_codecs: frozenset[str] | None = frozenset()
+    keeps_cover: bool = True
+    extra_args: tuple[str, ...] = ()
+    # encoder limits; sources above them are downmixed / resampled
+    max_channels: int | None = None
+    max_sample_rate: int | None = None
+    # rough CPU cost relative to one AAC 256k encode (1.0); 0 = remux only
+    cpu_cost: float = 1.0
+    description: str = ""
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        for key in ("copy_audio_codecs", "copy_video_codecs"):
+            if d[key] is not None:
+                d[key] = sorted(d[key])
+        return d
+
+
+def _audio(name: str, extension: str, args: tuple[str, ...], copy: set[str], **kw) -> ConversionPreset:
+    return ConversionPreset(name, "audio", extension, audio_args=args, copy_audio_codecs=frozenset(copy), **kw)
+
+
+def _video(name: str, video_args: tuple[str, ...], audio_args: tuple[str, ...], **kw) -> ConversionPreset:
+    return ConversionPreset(name, "video", name.split("-")[0], audio_args=audio_args, video_args=video_args, **kw)
+
+
+_REMUX_ANY = dict(copy_audio_codecs=None, copy_video_codecs=None, cpu_cost=0.0)
+
+BUILTIN_PRESETS: dict[str, ConversionPreset] = {p.name: p for p in (
+    # ── audio ──
+    _audio("mp3-320", "mp3", ("-c:a", "libmp3lame", "-b:a", "320k"), {"mp3"},
+           extra_args=("-id3v2_version", "3", "-write_id3v1", "1"),
+           max_channels=2, max_sample_rate=48000, cpu_cost=1.0, description="MP3 CBR 320 kbps"),
+    _audio("mp3-v0", "mp3", ("-c:a", "libmp3lame", "-q:a", "0"), {"mp3"},
+           extra_args=("-id3v2_version", "3", "-write_id3v1", "1"),
+           max_channels=2, max_sample_rate=48000, cpu_cost=1.0, description="MP3 VBR V0 (~245 kbps)"),
+    _audio("flac-max", "flac", ("-c:a", "flac", "-compression_level", "8"), {"flac"},
+           cpu_cost=1.2, description="FLAC, smallest files (level 8)"),
+    _audio("flac-fast", "flac", ("-c:a", "flac", "-compression_level", "0"), {"flac"},
+           cpu_cost=0.4, description="FLAC, fastest encode (level 0)"),
+    _audio("wav", "wav", ("-c:a", "pcm_s16le"), {"pcm_s16le"},
+           keeps_cover=False, cpu_cost=0.2, description="WAV 16-bit PCM"),
+    _audio("aac", "aac", ("-c:a", "aac", "-b:a", "256k"), {"aac"},
+           keeps_cover=False, cpu_cost=1.0, description="Raw AAC (ADTS) 256 kbps"),
+    _audio("m4a", "m4a", ("-c:a", "aac", "-b:a", "256k"), {"aac", "alac", "ac3", "eac3"},
+           cpu_cost=1.0, description="AAC 256 kbps in M4A"),
+    _audio("alac", "m4a", ("-c:a", "alac"), {"alac"},
+           cpu_cost=0.5, description="Apple Lossless in M4A"),
+    _audio("ogg", "ogg", ("-c:a", "libvorbis", "-q:a", "5"), {"vorbis"},
+           keeps_cover=False, cpu_cost=1.3, description="Ogg Vorbis q5 (~160 kbps)"),
+    _audio("opus-128", "opus", ("-c:a", "libopus", "-b:a", "128k"), {"opus"},
+           keeps_cover=False, cpu_cost=0.9, description="Opus 128 kbps"),
+    _audio("wma", "wma", ("-c:a", "wmav2", "-b:a", "192k"), {"wmav2"},
+           keeps_cover=False, max_channels=2, max_sample_rate=48000, cpu_cost=0.8,
+           description="WMA v2 192 kbps"),
+    # ── video ──
+    _video("mp4", (), (), **_REMUX_ANY, description="Remux to MP4"),
+    _video("mov", (), (), **_REMUX_ANY, description="Remux to QuickTime"),
+    _video("mkv", (), (), **_REMUX_ANY, description="Remux to Matroska"),
+    _video("avi", ("-c:v", "libx264"), ("-c:a", "aac"), cpu_cost=20.0, description="H.264/AAC in AVI"),
+    _video("wmv", ("-c:v", "wmv2"), ("-c:a", "wmav2"), cpu_cost=6.0, description="WMV2/WMA"),
+    _video("flv", ("-c:v", "flv"), ("-c:a", "aac"),
+           copy_video_codecs=frozenset({"h264"}), copy_audio_codecs=frozenset({"aac", "mp3"}),
+           cpu_cost=6.0, description="FLV (remux when the source is H.264)"),
+    _video("webm", ("-c:v", "libvpx-vp9"), ("-c:a", "libopus"),
+           copy_video_codecs=frozenset({"vp8", "vp9", "av1"}), copy_audio_codecs=frozenset({"opus", "vorbis"}),
+           cpu_cost=60.0, description="VP9/Opus in WebM"),
+)}
+
+# Plain format names that map onto a differently named preset
+PRESET_ALIASES: dict[str, str] = {
+    "mp3": "mp3-320",
+    "flac": "flac-max",
+    "opus": "opus-128",
+}
+
+_user_presets: dict[str, ConversionPreset] = {}
+
+
+def get_preset(name: str | None) -> ConversionPreset | None:
+    """Resolve a preset or format name (user presets win over built-ins)."""
+    if not name:
+        return None
+    key = name.lower()
+    for candidate in (key, PRESET_ALIASES.get(key)):
+        if candidate is None:
+            continue
+        preset = _user_presets.get(candidate) or BUILTIN_PRESETS.get(candidate)
+        if preset:
+            return preset
+    return None
+
+
+def split_formats(value: str | None) -> list[str]:
+    """Split a comma-separated format list ("flac-max,mp3-v0") into names, dropping duplicates."""
+    if not value:
+        return []
+    return list(dict.fromkeys(part.strip().lower() for part in value.split(",") if part.strip()))
+
+
+def list_presets(kind: str | None = None) -> list[ConversionPreset]:
+    merged = {**BUILTIN_PRESETS, **_user_presets}
+    return [p for p in merged.values() if kind is None or p.kind == kind]
+
+
+def preset_names(kind: str | None = None) -> list[str]:
+    """Every name accepted for the given kind: presets plus aliases."""
+    names = [p.name for p in list_presets(kind)]
+    names += [alias for alias, target in PRESET_ALIASES.items() if alias not in names and get_preset(target)
+              and (kind is None or get_preset(target).kind == kind)]
+    return names
+
+
+def preset_from_dict(name: str, data: dict) -> ConversionPreset:
+    """Build a preset from its settings.json form; raises ValueError if invalid."""
+    if not isinstance(data, dict):
+        raise ValueError(f"Preset {name!r} must be an object")
+    kind = data.get("kind", "audio")
+    if kind not in PRESET_KINDS:
+        raise ValueError(f"Preset {name!r}: kind must be one of {', '.join(PRESET_KINDS)}")
+    extension = str(data.get("extension") or "").lstrip(".")
+    if not extension:
+        raise ValueError(f"Preset {name!r}: extension is required")
+    if not _EXTENSION_RE.fullmatch(extension):
+        raise ValueError(f"Preset {name!r}: extension must be letters and digits only")
+
+    def args(key: str) -> tuple[str, ...]:
+        value = data.get(key) or []
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise ValueError(f"Preset {name!r}: {key} must be a list of strings")
+        return tuple(value)
+
+    def codecs(key: str) -> frozenset[str] | None:
+        value = data.get(key, [])
+        if value is None:
+            return None
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise ValueError(f"Preset {name!r}: {key} must be a list of strings or null")
+        return frozenset(value)
+
+    def limit(key: str) -> int | None:
+        value = data.get(key)
+        if value is None:
+            return None
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Preset {name!r}: {key} must be an integer") from None
+        if value <= 0:
+            raise ValueError(f"Preset {name!r}: {key} must be positive")
+        return value
+
+    return ConversionPreset(
+        name=name.lower(),
+        kind=kind,
+        extension=extension,
+        audio_args=args("audio_args"),
+        video_args=args("video_args"),
+        copy_audio_codecs=codecs("copy_audio_codecs"),
+        copy_video_codecs=codecs("copy_video_codecs"),
+        keeps_cover=bool(data.get("keeps_cover", kind == "audio")),
+        extra_args=args("extra_args"),
+        max_channels=limit("max_channels"),
+        max_sample_rate=limit("max_sample_rate"),
+        cpu_cost=float(data.get("cpu_cost", 1.0)),
+        description=str(data.get("description", "")),
+    )
+
+
+def load_user_presets(raw: dict | None) -> list[str]:
+    """Replace the user preset set from settings.json. Returns error messages for skipped entries."""
+    global _user_presets
+    presets: dict[str, ConversionPreset] = {}
+    errors: list[str] = []
+    for name, data in (raw or {}).items():
+        try:
+            presets[name.lower()] = preset_from_dict(name, data)
+        except (ValueError, TypeError) as e:
+            errors.append(str(e))
+            logger.warning(f"Ignoring conversion preset: {e}")
+    _user_presets = presets
+    return errors
@@ -0,0 +1,89 @@
+"""Opt-in per-task profiling.
+
+Wraps a task's execution with cProfile and writes one artifact pair per task:
+
+    <profile_dir>/<task_id>.prof   raw pstats dump (snakeviz / pstats.Stats)
+    <profile_dir>/<task_id>.txt    top functions sorted by cumulative time
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger("amdl.profiling")
+
+PROFILE_SUFFIXES = (".prof", ".txt")
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class TaskProfiler:
+    """Context manager that profiles the calling thread and dumps the result.
+
+    cProfile only sees the thread it was enabled on, which is exactly what we
+    want here: a task's download_urls() (and its event loop) runs on a single
+    worker thread.
+    """
+
+    def __init__(self, profile_dir: Path, task_id: str, top: int = 60):
+        self.profile_dir = Path(profile_dir)
+        self.task_id = task_id
+        self.top = top
+        self._profiler: cProfile.Profile | None = None
+
+    def __enter__(self) -> TaskProfiler:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+ allows a single active profiler per interpreter
+            logger.warning(f"[{self.task_id[:8]}] Profiling unavailable: {e}")
+            return self
+        self._profiler = profiler
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self._profiler:
+            return
+        self._profiler.disable()
+        try:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            self._profiler.dump_stats(str(self.profile_dir / f"{self.task_id}.prof"))
+            buf = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=buf)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+            (self.profile_dir / f"{self.task_id}.txt").write_text(buf.getvalue(), encoding="utf-8")
+        except Exception as e:
+            logger.error(f"[{self.task_id[:8]}] Failed to write profile: {e}")
+
+
+def list_profiles(profile_dir: Path | None) -> list[dict]:
+    """Return metadata for every profile artifact in profile_dir (newest first)."""
+    if not profile_dir or not Path(profile_dir).is_dir():
+        return []
+    items = []
+    for p in Path(profile_dir).iterdir():
+        if not p.is_file() or p.suffix not in PROFILE_SUFFIXES:
+            continue
+        st = p.stat()
+        items.append({
+            "name": p.name,
+            "task_id": p.stem,
+            "size": st.st_size,
+            "created_at": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(),
+        })
+    items.sort(key=lambda x: x["created_at"], reverse=True)
+    return items
+
+
+def resolve_profile(profile_dir: Path | None, name: str) -> Path | None:
+    """Resolve an artifact name to a path inside profile_dir, rejecting traversal."""
+    if not profile_dir or not _SAFE_NAME.match(name) or not name.endswith(PROFILE_SUFFIXES):
+        return None
+    path = Path(profile_dir) / name
+    return path if path.is_file() else None
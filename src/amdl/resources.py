@@ -0,0 +1,243 @@
+"""Process-wide CPU budget shared by download workers and ffmpeg conversions.
+
+Every ffmpeg run takes a Lease before it starts. The lease decides how many
+threads the run gets (`-threads`), which cores it may be pinned to and its
+scheduling priority, based on the job type and on how much of the budget is
+already in use:
+
+- remux / stream copy: no cores charged, 1 thread (I/O bound)
+- audio encode: the job's cost in cores (1 by default), 1 thread; audio
+  encoders barely scale with threads, and cheap ones (FLAC level 0, WAV)
+  share a core
+- video encode: every currently free core, at least 1, and no more than
+  the job's cost
+
+A job's cost is the sum of the `cpu_cost` of the presets it encodes to
+(see amdl.presets); stream-copied outputs cost nothing.
+
+Running download tasks hold one core each for their decrypt/remux work.
+When the budget is exhausted new conversions wait, but one conversion is
+always allowed to run so a fully booked budget cannot deadlock a task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+logger = logging.getLogger("amdl.resources")
+
+JOB_REMUX = "remux"
+JOB_AUDIO = "audio"
+JOB_VIDEO = "video"
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects affinity masks / cgroup cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        try:
+            return max(1, len(os.sched_getaffinity(0)))
+        except OSError:
+            pass
+    return max(1, os.cpu_count() or 1)
+
+
+@dataclass
+class Lease:
+    """What one ffmpeg run may use; release it via ResourceManager.release()."""
+
+    kind: str
+    threads: int
+    weight: float  # cores charged against the budget
+    cpus: list[int] = field(default_factory=list)  # pinned cores, empty = not pinned
+    nice: int = 0
+
+    def apply_threads(self, cmd: list[str], output_paths: list[str]) -> list[str]:
+        """Add `-threads` for the decoder and for each output's encoder."""
+        cmd = list(cmd)
+        for path in output_paths:
+            i = len(cmd) - 1 - cmd[::-1].index(path)
+            cmd[i:i] = ["-threads", str(self.threads)]
+        i = cmd.index("-i")
+        cmd[i:i] = ["-threads", str(self.threads)]
+        return cmd
+
+    def popen_kwargs(self) -> dict:
+        """Extra Popen / create_subprocess_exec arguments (Windows priority class)."""
+        if sys.platform == "win32" and self.nice > 0:
+            return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+        return {}
+
+    def apply_to_process(self, pid: int) -> None:
+        """Pin and renice a freshly started child process (best effort, POSIX only)."""
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(pid, self.cpus)
+            except OSError as e:
+                logger.debug(f"sched_setaffinity({pid}) failed: {e}")
+        if self.nice and hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+            except OSError as e:
+                logger.debug(f"setpriority({pid}) failed: {e}")
+
+
+class ResourceManager:
+    """Thread-safe core budget; usable from worker threads and any event loop."""
+
+    def __init__(self, cores: int | None = None, pin_cpus: bool = False, nice: int = 0):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: list[Callable[[], None]] = []
+        self._used = 0.0
+        self._conversions = 0
+        self._busy_cpus: set[int] = set()
+        self.configure(cores, pin_cpus, nice)
+
+    def configure(self, cores: int | None = None, pin_cpus: bool | None = None, nice: int | None = None) -> None:
+        """Change the budget / pinning / niceness; applies to leases taken afterwards."""
+        with self._lock:
+            self.cores = max(1, cores or available_cores())
+            if pin_cpus is not None:
+                self.pin_cpus = pin_cpus and hasattr(os, "sched_setaffinity")
+            if nice is not None:
+                self.nice = max(0, min(19, nice))
+            self._notify()
+
+    @property
+    def used(self) -> float:
+        return self._used
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "cores": self.cores,
+                "used": round(self._used, 2),
+                "conversions": self._conversions,
+                "pin_cpus": self.pin_cpus,
+                "nice": self.nice,
+            }
+
+    # ── leases ────────────────────────────────────────────────
+
+    def _cpu_ids(self) -> list[int]:
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(self.cores))
+
+    def _try_acquire(self, kind: str, cost: float | None = None) -> Lease | None:
+        free = self.cores - self._used
+        if kind == JOB_REMUX:
+            lease = Lease(kind, threads=1, weight=0)
+        elif free <= 0 and self._conversions > 0:
+            return None
+        elif kind == JOB_VIDEO:
+            threads = max(1, int(free))
+            if cost is not None:
+                threads = min(threads, max(1, math.ceil(cost)))
+            lease = Lease(kind, threads=threads, weight=threads)
+        else:
+            lease = Lease(kind, threads=1, weight=1 if cost is None else cost)
+
+        lease.nice = self.nice
+        if self.pin_cpus and lease.weight:
+            pinned = math.ceil(lease.weight)
+            idle = [c for c in self._cpu_ids() if c not in self._busy_cpus]
+            if len(idle) >= pinned:
+                lease.cpus = idle[:pinned]
+                self._busy_cpus.update(lease.cpus)
+        self._used += lease.weight
+        self._conversions += 1
+        return lease
+
+    def acquire(self, kind: str, cost: float | None = None) -> Lease:
+        """Block until the budget admits a job of this kind and cost."""
+        with self._cond:
+            while (lease := self._try_acquire(kind, cost)) is None:
+                self._cond.wait()
+            return lease
+
+    async def acquire_async(self, kind: str, cost: float | None = None) -> Lease:
+        """Like acquire(), but waits without blocking the running event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            with self._lock:
+                lease = self._try_acquire(kind, cost)
+                if lease is not None:
+                    return lease
+                wake = lambda: loop.call_soon_threadsafe(event.set)  # noqa: E731
+                self._async_waiters.append(wake)
+            try:
+                await event.wait()
+            finally:
+                with self._lock:
+                    if wake in self._async_waiters:
+                        self._async_waiters.remove(wake)
+
+    def release(self, lease: Lease) -> None:
+        with self._lock:
+            self._used -= lease.weight
+            self._conversions -= 1
+            self._busy_cpus.difference_update(lease.cpus)
+            self._notify()
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for wake in waiters:
+            try:
+                wake()
+            except RuntimeError:  # loop already closed
+                pass
+
+    @contextlib.contextmanager
+    def lease(self, kind: str, cost: float | None = None) -> Iterator[Lease]:
+        lease = self.acquire(kind, cost)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    @contextlib.asynccontextmanager
+    async def lease_async(self, kind: str, cost: float | None = None):
+        lease = await self.acquire_async(kind, cost)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    # ── download workers ──────────────────────────────────────
+
+    @contextlib.contextmanager
+    def reserve(self, cores: int = 1) -> Iterator[None]:
+        """Charge `cores` to the budget while a download task runs (never blocks)."""
+        with self._lock:
+            self._used += cores
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._used -= cores
+                self._notify()
+
+
+# ── Global singleton ─────────────────────────────────────────
+
+_resource_manager: ResourceManager | None = None
+
+
+def get_resource_manager() -> ResourceManager:
+    """Get the global ResourceManager singleton."""
+    global _resource_manager
+    if _resource_manager is None:
+        _resource_manager = ResourceManager()
+    return _resource_manager
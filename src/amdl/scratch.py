@@ -0,0 +1,175 @@
+"""Per-task scratch directories for gamdl's temp files.
+
+Every download task gets its own directory, <root>/amdl-task-<task id>, which
+is passed to gamdl as temp_path and removed when the task ends. Concurrent
+tasks never share a staging directory. Each task directory is registered
+with the temp GC as live, so only leftovers of dead tasks are ever collected.
+The GC only looks at `amdl-task-*` entries of a scratch root; other files on
+the same mount are never touched.
+
+The root is configurable (e.g. an NVMe or tmpfs mount). With mode "ram" or
+"auto", audio tasks can stage in a RAM-backed directory (/dev/shm on Linux)
+so decrypt/remux intermediates never hit the disk:
+
+- disk: always <root>
+- ram:  RAM while the RAM filesystem has at least `ram_min_free` bytes
+        free, else <root>
+- auto: like ram, but only for tasks without music videos / uploaded
+        videos; URL list files are read to tell
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from amdl.catalog import parse_catalog_url
+from amdl.temp_gc import get_temp_gc
+from amdl.url_source import UrlSource
+
+logger = logging.getLogger("amdl.scratch")
+
+SCRATCH_MODES = ("disk", "ram", "auto")
+TASK_DIR_PREFIX = "amdl-task-"
+
+# Catalog types (see amdl.catalog) far too large to stage in RAM
+_VIDEO_TYPES = frozenset({"music-video", "post", "library-music-videos"})
+
+
+def _default_ram_root() -> Path | None:
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / "amdl"
+    return None
+
+
+def _has_video(urls: list[str], read_files: bool) -> bool:
+    """True if a URL, or a line of a URL file with `read_files`, is a music video or uploaded video."""
+    for url in UrlSource(urls, read_files=read_files):
+        ref = parse_catalog_url(url)
+        if ref is not None and ref.type in _VIDEO_TYPES:
+            return True
+    return False
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+@dataclass
+class ScratchDir:
+    path: Path
+    in_ram: bool
+    peak_bytes: int = 0
+    _sampled_at: float = 0.0
+
+    def sample(self, min_interval: float = 1.0) -> int:
+        """Measure the directory (at most every `min_interval` s) and track the peak."""
+        now = time.monotonic()
+        if now - self._sampled_at >= min_interval:
+            self._sampled_at = now
+            self.peak_bytes = max(self.peak_bytes, _tree_size(self.path))
+        return self.peak_bytes
+
+    def to_dict(self) -> dict:
+        return {"path": str(self.path), "in_ram": self.in_ram, "peak_bytes": self.peak_bytes}
+
+
+class ScratchManager:
+    def __init__(
+        self,
+        root: Path | str | None = None,
+        mode: str = "disk",
+        ram_root: Path | None = None,
+        ram_min_free: int = 1024 * 1024 * 1024,
+    ):
+        self._lock = threading.Lock()
+        self.configure(root, mode, ram_root, ram_min_free)
+
+    def configure(
+        self,
+        root: Path | str | None = None,
+        mode: str = "disk",
+        ram_root: Path | None = None,
+        ram_min_free: int | None = None,
+    ) -> None:
+        if mode not in SCRATCH_MODES:
+            raise ValueError(f"scratch mode must be one of {', '.join(SCRATCH_MODES)}")
+        with self._lock:
+            self.root = Path(root) if root else None
+            self.mode = mode
+            self.ram_root = ram_root or _default_ram_root()
+            if ram_min_free is not None:
+                self.ram_min_free = ram_min_free
+
+    def _use_ram(self, urls: list[str], read_files: bool) -> bool:
+        if self.mode == "disk" or self.ram_root is None:
+            return False
+        try:
+            free = shutil.disk_usage(self.ram_root.parent).free
+        except OSError:
+            return False
+        if free < self.ram_min_free:
+            return False
+        return self.mode == "ram" or not _has_video(urls, read_files)
+
+    @contextlib.contextmanager
+    def task_dir(
+        self,
+        task_id: str,
+        default_root: Path | str,
+        urls: list[str] | None = None,
+        read_files: bool = False,
+    ) -> Iterator[ScratchDir]:
+        """Create the task's scratch directory, mark it live for the temp GC, remove it afterwards.
+
+        `read_files` means `urls` are URL list files (read_urls_as_txt).
+        """
+        in_ram = self._use_ram(urls or [], read_files)
+        root = self.ram_root if in_ram else (self.root or Path(default_root))
+        path = Path(root).resolve() / f"{TASK_DIR_PREFIX}{task_id}"
+        scratch = ScratchDir(path, in_ram)
+        try:
+            # live before it exists, so a GC pass can never catch it in between
+            with get_temp_gc().in_use(path, prefix=TASK_DIR_PREFIX):
+                path.mkdir(parents=True, exist_ok=True)
+                yield scratch
+        finally:
+            scratch.sample(min_interval=0)
+            shutil.rmtree(path, ignore_errors=True)
+            logger.debug(f"Removed scratch dir {path} (peak {scratch.peak_bytes} bytes)")
+
+    def status(self) -> dict:
+        return {
+            "root": str(self.root) if self.root else None,
+            "mode": self.mode,
+            "ram_root": str(self.ram_root) if self.ram_root else None,
+            "ram_min_free": self.ram_min_free,
+        }
+
+
+# ── Global singleton ─────────────────────────────────────────
+
+_scratch_manager: ScratchManager | None = None
+
+
+def get_scratch_manager() -> ScratchManager:
+    """Get the global ScratchManager singleton."""
+    global _scratch_manager
+    if _scratch_manager is None:
+        _scratch_manager = ScratchManager()
+    return _scratch_manager
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
 import sys
 import shutil
@@ -10,11 +10,14 @@ import time
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
 
+from amdl.converter import resolve_ffmpeg_executable
 from amdl.enums import (
     CoverFormat,
     DownloadMode,
@@ -23,7 +26,15 @@ from amdl.enums import (
     SyncedLyricsFormat,
     UploadedVideoQuality,
 )
-from amdl.task_manager import get_task_manager
+from amdl.json_codec import FastJSONResponse, dumps
+from amdl.presets import get_preset, list_presets, load_user_presets, preset_names, split_formats
+from amdl.profiling import list_profiles, resolve_profile
+from amdl.resources import get_resource_manager
+from amdl.scratch import TASK_DIR_PREFIX, get_scratch_manager
+from amdl.settings_store import SettingsConflict, SettingsStore
+from amdl.temp_gc import get_temp_gc
+from amdl.static_files import StaticIndex
+from amdl.task_manager import TaskKind, TaskStatus, get_task_manager
 
 logger = logging.getLogger("amdl.server")
 
@@ -39,6 +50,8 @@ else:
 
 TEMP_DIR = BASE_DIR / "temp"
 SETTINGS_FILE = BASE_DIR / "settings.json"
+settings_store = SettingsStore(SETTINGS_FILE)
+static_index = StaticIndex(FRONTEND_OUT)
 
 # ── 图标：根据平台自动选择 ────────────────────────────────
 import platform as _platform
@@ -56,10 +69,18 @@ else:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    _apply_runtime_settings()
+    await asyncio.to_thread(static_index.build)
     tm = get_task_manager()
     tm.start()
+    # Probe tool versions in the background so the first /api/dependencies is instant
+    warm_up = asyncio.create_task(_warm_dependency_cache())
+    get_temp_gc().add_root(TEMP_DIR)
+    temp_gc = asyncio.create_task(_temp_gc_loop())
     logger.info("AMDL server started")
     yield
+    warm_up.cancel()
+    temp_gc.cancel()
     await tm.stop()
     logger.info("AMDL server stopped")
 
@@ -86,10 +107,50 @@ app.add_middleware(
 )
 
 
+class ApiGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware limited to /api/ routes.
+
+    Static files carry content ETags and their own precompressed variants;
+    gzipping them here would give the gzip and identity bodies one ETag.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Task lists with logs compress ~10x; small responses aren't worth the CPU
+app.add_middleware(ApiGZipMiddleware, minimum_size=1024)
+
+
 # ═══════════════════════════════════════════════════════════════
 # Models
 # ═══════════════════════════════════════════════════════════════
 
+def _check_format(v: str | None, kind: str) -> str | None:
+    """Accept a comma-separated list of conversion presets (or format aliases) of the given kind.
+
+    Several formats are written from one decode of each source; they must
+    produce distinct file extensions.
+    """
+    if v is None:
+        return v
+    names = split_formats(v)
+    if not names:
+        raise ValueError(f"Unsupported {kind} format: {v}")
+    extensions: dict[str, str] = {}
+    for name in names:
+        preset = get_preset(name)
+        if preset is None or preset.kind != kind:
+            raise ValueError(f"Unsupported {kind} format: {name}")
+        if preset.extension in extensions:
+            raise ValueError(f"{extensions[preset.extension]} and {name} both produce .{preset.extension} files")
+        extensions[preset.extension] = name
+    return ",".join(names)
+
+
 class DownloadRequest(BaseModel):
     urls: list[str] = Field(..., min_length=1)
     cookies_path: str = Field(...)
@@ -108,6 +169,7 @@ class DownloadRequest(BaseModel):
     truncate: int | None = Field(default=None, ge=0)
     audio_format: str | None = Field(default=None)
     video_format: str | None = Field(default=None)
+    conversion_concurrency: int | None = Field(default=None, ge=1, le=64)
     template_folder_album: str = Field(default="{album_artist}/{album}")
     template_folder_compilation: str = Field(default="Compilations/{album}")
     template_file_single_disc: str = Field(default="{track:02d} {title}")
@@ -124,8 +186,10 @@ class DownloadRequest(BaseModel):
     no_synced_lyrics: bool = Field(default=False)
     disable_music_video_skip: bool = Field(default=False)
     read_urls_as_txt: bool = Field(default=False)
+    library_index: bool = Field(default=False)
     language: str = Field(default="en-US")
     log_level: str = Field(default="INFO")
+    profile: bool = Field(default=False)
 
     @field_validator("cookies_path")
     @classmethod
@@ -151,20 +215,107 @@ class DownloadRequest(BaseModel):
     @field_validator("audio_format")
     @classmethod
     def _validate_audio_fmt(cls, v: str | None) -> str | None:
-        if v is None:
-            return v
-        if v.lower() not in {"mp3", "flac", "wav", "aac", "m4a", "ogg", "wma", "alac"}:
-            raise ValueError(f"Unsupported format: {v}")
-        return v.lower()
+        return _check_format(v, "audio")
 
     @field_validator("video_format")
     @classmethod
     def _validate_video_fmt(cls, v: str | None) -> str | None:
+        return _check_format(v, "video")
+
+
+def _check_overrides(overrides: dict | None) -> None:
+    """Reject extra submission keys that are not DownloadRequest fields (typos would be dropped)."""
+    # URLs come from `urls` / `groups`, never from an override
+    unknown = sorted(set(overrides or ()) - (set(DownloadRequest.model_fields) - {"urls"}))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+
+class TaskSubmitRequest(BaseModel):
+    """POST /api/tasks body: URLs plus any DownloadRequest fields to override.
+
+    Omitted fields come from settings.json (the saved form values), optionally
+    layered with a named profile from its "task_profiles" section. Keys that
+    are not DownloadRequest fields are rejected.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    urls: list[str] = Field(..., min_length=1)
+    task_profile: str | None = Field(default=None)
+
+    @model_validator(mode="after")
+    def _validate_overrides(self) -> "TaskSubmitRequest":
+        _check_overrides(self.model_extra)
+        return self
+
+
+class TaskBatchSubmitRequest(BaseModel):
+    """POST /api/tasks/batch body: one task per URL group, all sharing the other fields.
+
+    Shared fields behave as in TaskSubmitRequest and are validated once.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    groups: list[list[str]] = Field(..., min_length=1, max_length=5000)
+    task_profile: str | None = Field(default=None)
+
+    @field_validator("groups")
+    @classmethod
+    def _validate_groups(cls, v: list[list[str]]) -> list[list[str]]:
+        empty = [i for i, group in enumerate(v) if not group]
+        if empty:
+            raise ValueError(f"URL groups must not be empty (index {', '.join(map(str, empty))})")
+        return v
+
+    @model_validator(mode="after")
+    def _validate_overrides(self) -> "TaskBatchSubmitRequest":
+        _check_overrides(self.model_extra)
+        return self
+
+
+class TaskIdsRequest(BaseModel):
+    task_ids: list[str] = Field(..., min_length=1, max_length=5000)
+    fields: str | None = Field(default=None)  # batch status only, as ?fields= on GET /api/tasks
+
+
+class ConvertRequest(BaseModel):
+    files: list[str] | None = Field(default=None)
+    directory: str | None = Field(default=None)
+    audio_format: str | None = Field(default=None)
+    video_format: str | None = Field(default=None)
+    ffmpeg_path: str = Field(default="ffmpeg")
+    concurrency: int | None = Field(default=None, ge=1, le=64)
+    profile: bool = Field(default=False)
+
+    @field_validator("audio_format")
+    @classmethod
+    def _validate_audio_fmt(cls, v: str | None) -> str | None:
+        return _check_format(v, "audio")
+
+    @field_validator("video_format")
+    @classmethod
+    def _validate_video_fmt(cls, v: str | None) -> str | None:
+        return _check_format(v, "video")
+
+    @field_validator("directory")
+    @classmethod
+    def _validate_directory(cls, v: str | None) -> str | None:
         if v is None:
             return v
-        if v.lower() not in {"mp4", "mov", "mkv", "avi", "wmv", "flv", "webm"}:
-            raise ValueError(f"Unsupported format: {v}")
-        return v.lower()
+        v = v.strip()
+        if not Path(v).is_dir():
+            raise ValueError(f"Directory not found: {v}")
+        return v
+
+    @model_validator(mode="after")
+    def _validate_sources(self) -> "ConvertRequest":
+        if not self.files and not self.directory:
+            raise ValueError("files or directory is required")
+        if not self.audio_format and not self.video_format:
+            raise ValueError("audio_format or video_format is required")
+        return self
 
 
 class HealthResponse(BaseModel):
@@ -190,8 +341,25 @@ class TaskSubmitResponse(BaseModel):
     message: str
 
 
+class TaskBatchSubmitResponse(BaseModel):
+    task_ids: list[str]
+    status: str
+    message: str
+
+
+class TaskBatchCancelResponse(BaseModel):
+    cancelled: list[str]
+    skipped: list[str]  # unknown or already finished
+
+
+class TaskBatchStatusResponse(BaseModel):
+    tasks: list[TaskInfoResponse]
+    missing: list[str]
+
+
 class TaskInfoResponse(BaseModel):
     id: str
+    kind: str = "download"
     status: str
     progress: dict
     error_count: int
@@ -200,10 +368,49 @@ class TaskInfoResponse(BaseModel):
     created_at: str
     updated_at: str
     urls: list[str]
+    scratch: dict | None = None
+    parent_id: str | None = None  # set on shards
+    children: list[str] | None = None  # shard IDs, set on a sharded task
 
 
 class TaskListResponse(BaseModel):
     tasks: list[TaskInfoResponse]
+    total: int  # tasks matching the status filter, across all pages
+    next_cursor: str | None = None
+    counts: dict[str, int] = Field(default_factory=dict)  # tasks per status
+
+
+class ProfileInfo(BaseModel):
+    name: str
+    task_id: str
+    size: int
+    created_at: str
+
+
+class ProfileListResponse(BaseModel):
+    profiles: list[ProfileInfo]
+    total: int
+
+
+class PresetInfo(BaseModel):
+    name: str
+    kind: str
+    extension: str
+    audio_args: list[str]
+    video_args: list[str]
+    copy_audio_codecs: list[str] | None
+    copy_video_codecs: list[str] | None
+    keeps_cover: bool
+    extra_args: list[str]
+    max_channels: int | None
+    max_sample_rate: int | None
+    cpu_cost: float
+    description: str
+
+
+class PresetListResponse(BaseModel):
+    presets: list[PresetInfo]
+    aliases: dict[str, str]
     total: int
 
 
@@ -221,29 +428,232 @@ class ApiInfoResponse(BaseModel):
 # Helpers
 # ═══════════════════════════════════════════════════════════════
 
-def _find_executable(name: str, custom_path: str | None = None) -> DependencyCheckItem:
-    target = custom_path or name
-    found_path = shutil.which(target)
+# settings.json keys that configure the running server rather than the frontend
+RUNTIME_SETTINGS = (
+    "conversion_presets",
+    "cpu_budget",
+    "pin_conversion_cpus",
+    "conversion_nice",
+    "temp_gc_interval_minutes",
+    "temp_gc_min_age_minutes",
+    "temp_gc_max_mb",
+    "scratch_root",
+    "scratch_mode",
+    "scratch_ram_min_free_mb",
+    "task_workers",
+    "shard_size",
+)
+
+
+def _apply_runtime_settings() -> None:
+    """Apply settings.json to the running server: presets, CPU budget, temp GC, scratch dirs and workers."""
+    settings, _ = settings_store.snapshot()
+    presets = settings.get("conversion_presets")
+    load_user_presets(presets if isinstance(presets, dict) else None)
+    try:
+        get_resource_manager().configure(
+            cores=int(settings.get("cpu_budget") or 0) or None,
+            pin_cpus=bool(settings.get("pin_conversion_cpus", False)),
+            nice=int(settings.get("conversion_nice") or 0),
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid CPU budget settings: {e}")
+    try:
+        max_mb = settings.get("temp_gc_max_mb")
+        get_temp_gc().configure(
+            interval=float(settings.get("temp_gc_interval_minutes") or 10) * 60,
+            min_age=float(settings.get("temp_gc_min_age_minutes") or 15) * 60,
+            max_bytes=int(max_mb) * 1024 * 1024 if max_mb else None,
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid temp GC settings: {e}")
+    try:
+        scratch = get_scratch_manager()
+        scratch.configure(
+            root=settings.get("scratch_root") or None,
+            mode=settings.get("scratch_mode") or "disk",
+            ram_min_free=int(settings.get("scratch_ram_min_free_mb") or 1024) * 1024 * 1024,
+        )
+        # Scratch roots may be shared mounts: only task directories are ever collected
+        gc = get_temp_gc()
+        if scratch.root:
+            gc.add_root(scratch.root, prefixes=(TASK_DIR_PREFIX,))
+        if scratch.ram_root and scratch.mode != "disk":
+            gc.add_root(scratch.ram_root, prefixes=(TASK_DIR_PREFIX,))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid scratch settings: {e}")
+    try:
+        shard_size = settings.get("shard_size")
+        get_task_manager().configure(
+            max_concurrent=int(settings.get("task_workers") or 1),
+            shard_size=int(shard_size) if shard_size is not None else 200,
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid task worker settings: {e}")
+
 
-    if found_path and Path(found_path).exists():
+async def _temp_gc_loop() -> None:
+    """Collect orphaned temp entries every `interval` seconds, off the event loop."""
+    gc = get_temp_gc()
+    while True:
+        await asyncio.sleep(gc.interval)
         try:
-            result = subprocess.run(
-                [found_path, "-version"] if name in ("ffmpeg", "MP4Box") else [found_path, "--version"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
-            version_line = (result.stdout or result.stderr).split("\n")[0]
-        except Exception:
-            version_line = None
-        return DependencyCheckItem(
-            name=name,
-            found=True,
-            path=str(Path(found_path).resolve()),
-            version=version_line,
+            await asyncio.to_thread(gc.collect)
+        except Exception as e:
+            logger.warning(f"Temp GC failed: {e}")
+
+
+def _task_statuses(status: str | None) -> list[TaskStatus] | None:
+    """Parse ?status=running,pending; None means no filter."""
+    if not status:
+        return None
+    try:
+        return [TaskStatus(s.strip()) for s in status.split(",") if s.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status: {status}. Available: {', '.join(s.value for s in TaskStatus)}",
+        )
+
+
+def _task_fields(fields: str | None) -> list[str] | None:
+    """Parse ?fields=id,status,progress; None selects the full task object."""
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in selected if f not in TaskInfoResponse.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown task field(s): {', '.join(unknown)}. Available: {', '.join(TaskInfoResponse.model_fields)}",
+        )
+    return selected
+
+
+# External tools reported by /api/dependencies, in display order
+DEPENDENCIES = ("ffmpeg", "MP4Box", "N_m3u8DL-RE")
+
+# (resolved path, size, mtime_ns) → first line of `<tool> -version`
+_version_cache: dict[tuple[str, int, int], str | None] = {}
+
+
+# (task profile, settings version) → merged defaults, validated template or None
+_task_defaults_cache: dict[tuple[str | None, int], tuple[dict, DownloadRequest | None]] = {}
+
+
+def _task_defaults(task_profile: str | None) -> tuple[dict, DownloadRequest | None]:
+    """DownloadRequest defaults from settings.json, layered with a named profile.
+
+    Returns (defaults, template). The template is the defaults already
+    validated as a DownloadRequest (with placeholder URLs), or None when the
+    defaults alone don't validate (e.g. no cookies_path saved yet). Both are
+    cached until settings.json changes.
+    """
+    settings, version = settings_store.snapshot()
+    key = (task_profile, version)
+    if key in _task_defaults_cache:
+        return _task_defaults_cache[key]
+
+    profiles = settings.get("task_profiles") or {}
+    if task_profile is not None and task_profile not in profiles:
+        raise HTTPException(status_code=400, detail=f"Unknown task profile: {task_profile}")
+    fields = DownloadRequest.model_fields.keys() - {"urls"}
+    defaults: dict = {}
+    for layer in (settings, profiles.get(task_profile) or {}):
+        # Empty strings are unset form fields in settings.json
+        defaults.update({k: v for k, v in layer.items() if k in fields and v != ""})
+    try:
+        template = DownloadRequest.model_validate({**defaults, "urls": ["-"]})
+    except ValidationError:
+        template = None
+
+    # Entries of older settings versions are never hit again
+    for stale in [k for k in _task_defaults_cache if k[1] != version]:
+        del _task_defaults_cache[stale]
+    _task_defaults_cache[key] = (defaults, template)
+    return defaults, template
+
+
+def _resolve_task_request(
+    request: TaskSubmitRequest | TaskBatchSubmitRequest, urls: list[str] | None = None
+) -> DownloadRequest:
+    """Merge a submission onto the cached defaults; URL-only submissions skip validation."""
+    urls = urls or request.urls
+    defaults, template = _task_defaults(request.task_profile)
+    overrides = request.model_extra or {}
+    # The cookies file can disappear after the template was validated; if it
+    # did, full validation below reports it as a 422
+    if template is not None and not overrides and Path(template.cookies_path).is_file():
+        return template.model_copy(update={"urls": urls})
+    try:
+        return DownloadRequest.model_validate({**defaults, **overrides, "urls": urls})
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def _locate_executable(name: str, custom_path: str | None) -> tuple[str, int, int] | None:
+    """Resolve a tool to (real path, size, mtime_ns); cheap enough to run on the event loop."""
+    found_path = shutil.which(custom_path or name)
+    if not found_path:
+        return None
+    try:
+        resolved = Path(found_path).resolve()
+        st = resolved.stat()
+    except OSError:
+        return None
+    return str(resolved), st.st_size, st.st_mtime_ns
+
+
+def _probe_version(name: str, path: str) -> str | None:
+    try:
+        result = subprocess.run(
+            [path, "-version"] if name in ("ffmpeg", "MP4Box") else [path, "--version"],
+            capture_output=True,
+            text=True,
+            timeout=5,
         )
+        return (result.stdout or result.stderr).split("\n")[0]
+    except Exception:
+        return None
 
-    return DependencyCheckItem(name=name, found=False)
+
+def _find_executable(name: str, custom_path: str | None = None) -> DependencyCheckItem:
+    """Blocking lookup; the version probe is cached until the binary changes."""
+    key = _locate_executable(name, custom_path)
+    if key is None:
+        return DependencyCheckItem(name=name, found=False)
+    if key not in _version_cache:
+        _version_cache[key] = _probe_version(name, key[0])
+    return DependencyCheckItem(name=name, found=True, path=key[0], version=_version_cache[key])
+
+
+async def _find_executables(paths: dict[str, str | None]) -> list[DependencyCheckItem]:
+    """Check several tools at once.
+
+    Cached tools are answered straight from the loop; the rest are probed
+    concurrently in worker threads so the loop never waits on a subprocess.
+    """
+    items: list[DependencyCheckItem | None] = []
+    pending = {}
+    for name, custom_path in paths.items():
+        key = _locate_executable(name, custom_path)
+        if key is None:
+            items.append(DependencyCheckItem(name=name, found=False))
+        elif key in _version_cache:
+            items.append(DependencyCheckItem(name=name, found=True, path=key[0], version=_version_cache[key]))
+        else:
+            pending[len(items)] = asyncio.to_thread(_find_executable, name, custom_path)
+            items.append(None)
+    for index, item in zip(pending, await asyncio.gather(*pending.values())):
+        items[index] = item
+    return items
+
+
+async def _warm_dependency_cache() -> None:
+    try:
+        await _find_executables({name: None for name in DEPENDENCIES})
+    except Exception as e:
+        logger.debug(f"Dependency warm-up failed: {e}")
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -254,29 +664,35 @@ def _find_executable(name: str, custom_path: str | None = None) -> DependencyChe
 async def health_check():
     return HealthResponse()
 
+def _settings_etag(version: int) -> str:
+    return f'"{version}"'
+
+
 @app.get("/api/settings", tags=["system"])
 async def get_settings():
-    if SETTINGS_FILE.exists():
-        try:
-            return JSONResponse(content=json.loads(SETTINGS_FILE.read_text(encoding="utf-8")))
-        except Exception:
-            pass
-    return JSONResponse(content={})
+    settings, version = settings_store.snapshot()
+    return JSONResponse(content=settings, headers={"ETag": _settings_etag(version)})
 
 
 @app.post("/api/settings", tags=["system"])
-async def save_settings(payload: dict):
-    # 读取已有设置，做合并而非覆盖
-    existing: dict = {}
-    if SETTINGS_FILE.exists():
+async def save_settings(payload: dict, if_match: str | None = Header(default=None)):
+    # 与已有设置合并而非覆盖；带 If-Match 时仅在版本未变时写入
+    expected = None
+    if if_match and if_match.strip() != "*":
         try:
-            existing = json.loads(SETTINGS_FILE.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    existing.update(payload)
-    SETTINGS_FILE.write_text(json.dumps(existing, ensure_ascii=False, indent=2), encoding="utf-8")
-    return JSONResponse(content={"status": "ok"})
-
+            expected = int(if_match.strip().removeprefix("W/").strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid If-Match: {if_match}")
+    try:
+        version = await asyncio.to_thread(settings_store.update, payload, expected)
+    except SettingsConflict as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    if any(key in payload for key in RUNTIME_SETTINGS):
+        _apply_runtime_settings()
+    return JSONResponse(
+        content={"status": "ok", "version": version},
+        headers={"ETag": _settings_etag(version)},
+    )
 
 
 @app.get("/api/info", response_model=ApiInfoResponse, tags=["system"])
@@ -287,32 +703,41 @@ async def get_api_info():
         supported_codecs_music_video=[{"value": c.value, "label": c.name} for c in MusicVideoCodec],
         supported_cover_formats=[{"value": c.value, "label": c.name} for c in CoverFormat],
         supported_download_modes=[{"value": c.value, "label": c.name} for c in DownloadMode],
-        supported_audio_conversion_formats=["mp3", "flac", "wav", "aac", "m4a", "ogg", "alac"],
-        supported_video_conversion_formats=["mp4", "mov", "mkv", "avi", "webm"],
+        supported_audio_conversion_formats=preset_names("audio"),
+        supported_video_conversion_formats=preset_names("video"),
     )
 
 
+@app.get("/api/resources", tags=["system"])
+async def get_resources():
+    """Current CPU budget: total cores, cores in use and running conversions."""
+    return JSONResponse(content=get_resource_manager().snapshot())
+
+
 @app.get("/api/dependencies", response_model=DependencyCheckResponse, tags=["system"])
 async def check_dependencies(ffmpeg_path: str = "", nm3u8dlre_path: str = "", mp4box_path: str = ""):
-    deps = [
-        _find_executable("ffmpeg", ffmpeg_path or None),
-        _find_executable("MP4Box", mp4box_path or None),
-        _find_executable("N_m3u8DL-RE", nm3u8dlre_path or None),
-    ]
+    deps = await _find_executables({
+        "ffmpeg": ffmpeg_path or None,
+        "MP4Box": mp4box_path or None,
+        "N_m3u8DL-RE": nm3u8dlre_path or None,
+    })
     return DependencyCheckResponse(all_ok=all(d.found for d in deps), dependencies=deps)
 
 
+@app.get("/api/temp", tags=["system"])
+async def temp_status():
+    """Temp GC configuration, known temp roots and the last collection report."""
+    return JSONResponse(content=get_temp_gc().status())
+
+
 @app.delete("/api/temp", tags=["system"])
 async def clean_temp():
-    count = 0
-    if TEMP_DIR.exists():
-        for item in TEMP_DIR.iterdir():
-            if item.is_dir():
-                shutil.rmtree(item)
-            else:
-                item.unlink()
-            count += 1
-    return {"message": f"Cleaned {count} items from temp directory"}
+    # 只清理没有运行中任务使用的临时文件，在线程中执行以免阻塞事件循环
+    report = await asyncio.to_thread(get_temp_gc().collect, True)
+    return {
+        "message": f"Cleaned {report.removed} items from temp directory",
+        **report.to_dict(),
+    }
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -320,29 +745,88 @@ async def clean_temp():
 # ═══════════════════════════════════════════════════════════════
 
 @app.post("/api/tasks", response_model=TaskSubmitResponse, tags=["tasks"])
-async def submit_task(request: DownloadRequest):
+async def submit_task(request: TaskSubmitRequest):
     tm = get_task_manager()
-    task_id = await tm.submit(request.model_dump())
+    task_id = await tm.submit(_resolve_task_request(request).model_dump())
     return TaskSubmitResponse(task_id=task_id, status="pending", message="Task submitted")
 
 
+@app.post("/api/tasks/batch", response_model=TaskBatchSubmitResponse, tags=["tasks"])
+async def submit_tasks(request: TaskBatchSubmitRequest):
+    # Shared fields are validated once (cookies_path etc.); each group only swaps the URLs
+    first = _resolve_task_request(request, request.groups[0])
+    requests = [first] + [first.model_copy(update={"urls": group}) for group in request.groups[1:]]
+    task_ids = await get_task_manager().submit_many([r.model_dump() for r in requests])
+    return TaskBatchSubmitResponse(task_ids=task_ids, status="pending", message=f"{len(task_ids)} tasks submitted")
+
+
+@app.post("/api/tasks/batch/cancel", response_model=TaskBatchCancelResponse, tags=["tasks"])
+async def cancel_tasks(request: TaskIdsRequest):
+    cancelled = await get_task_manager().cancel_tasks(request.task_ids)
+    done = set(cancelled)
+    return TaskBatchCancelResponse(
+        cancelled=cancelled,
+        skipped=[task_id for task_id in dict.fromkeys(request.task_ids) if task_id not in done],
+    )
+
+
+@app.post("/api/tasks/batch/status", response_model=TaskBatchStatusResponse, tags=["tasks"])
+async def batch_task_status(request: TaskIdsRequest):
+    tm = get_task_manager()
+    selected = _task_fields(request.fields)
+    tasks, missing = [], []
+    for task_id in dict.fromkeys(request.task_ids):
+        task = tm.get_task(task_id)
+        if task is None:
+            missing.append(task_id)
+        else:
+            tasks.append(task)
+    if selected is None:
+        body = b'{"tasks":[' + b",".join(t.snapshot_json() for t in tasks) + b"]," + dumps({"missing": missing})[1:]
+        return FastJSONResponse(body)
+    return FastJSONResponse({"tasks": [t.to_dict(selected) for t in tasks], "missing": missing})
+
+
 @app.get("/api/tasks", response_model=TaskListResponse, tags=["tasks"])
-async def list_tasks():
+async def list_tasks(
+    status: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
     tm = get_task_manager()
-    tasks = tm.list_tasks()
-    return TaskListResponse(
-        tasks=[TaskInfoResponse(**t.to_dict()) for t in tasks],
-        total=len(tasks),
-    )
+    statuses = _task_statuses(status)
+    try:
+        after = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    tasks, next_cursor, total = tm.page_tasks(statuses, limit, after)
+    meta = {
+        "total": total,
+        "next_cursor": str(next_cursor) if next_cursor is not None else None,
+        "counts": tm.status_counts(),
+    }
+    selected = _task_fields(fields)
+    if selected is None:
+        # Splice the cached per-task JSON; nothing is re-encoded for unchanged tasks
+        body = b'{"tasks":[' + b",".join(t.snapshot_json() for t in tasks) + b"]," + dumps(meta)[1:]
+        return FastJSONResponse(body)
+    return FastJSONResponse({
+        "tasks": [t.to_dict(selected) for t in tasks],
+        **meta,
+    })
 
 
 @app.get("/api/tasks/{task_id}", response_model=TaskInfoResponse, tags=["tasks"])
-async def get_task(task_id: str):
+async def get_task(task_id: str, fields: str | None = None):
     tm = get_task_manager()
     task = tm.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
-    return TaskInfoResponse(**task.to_dict())
+    selected = _task_fields(fields)
+    if selected is None:
+        return FastJSONResponse(task.snapshot_json())
+    return FastJSONResponse(task.to_dict(selected))
 
 
 @app.delete("/api/tasks/{task_id}", tags=["tasks"])
@@ -354,6 +838,51 @@ async def cancel_task(task_id: str):
     return {"message": "Task cancelled", "task_id": task_id}
 
 
+# ═══════════════════════════════════════════════════════════════
+# API — Conversion
+# ═══════════════════════════════════════════════════════════════
+
+@app.post("/api/convert", response_model=TaskSubmitResponse, tags=["convert"])
+async def submit_conversion(request: ConvertRequest):
+    if not resolve_ffmpeg_executable(request.ffmpeg_path):
+        raise HTTPException(status_code=400, detail=f"FFmpeg not found: {request.ffmpeg_path}")
+    tm = get_task_manager()
+    task_id = await tm.submit(request.model_dump(), kind=TaskKind.CONVERT)
+    return TaskSubmitResponse(task_id=task_id, status="pending", message="Conversion task submitted")
+
+
+@app.get("/api/presets", response_model=PresetListResponse, tags=["convert"])
+async def list_conversion_presets(kind: str | None = None):
+    presets = list_presets(kind)
+    return PresetListResponse(
+        presets=[PresetInfo(**p.to_dict()) for p in presets],
+        aliases={alias: get_preset(alias).name for alias in preset_names(kind) if get_preset(alias).name != alias},
+        total=len(presets),
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# API — Profiles
+# ═══════════════════════════════════════════════════════════════
+
+@app.get("/api/profiles", response_model=ProfileListResponse, tags=["profiles"])
+async def list_task_profiles():
+    profiles = list_profiles(get_task_manager().profile_dir)
+    return ProfileListResponse(
+        profiles=[ProfileInfo(**p) for p in profiles],
+        total=len(profiles),
+    )
+
+
+@app.get("/api/profiles/{name}", tags=["profiles"])
+async def download_task_profile(name: str):
+    path = resolve_profile(get_task_manager().profile_dir, name)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {name}")
+    media_type = "text/plain" if path.suffix == ".txt" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
 # ═══════════════════════════════════════════════════════════════
 # WebSocket
 # ═══════════════════════════════════════════════════════════════
@@ -385,10 +914,10 @@ async def task_progress_ws(websocket: WebSocket, task_id: str):
 # ═══════════════════════════════════════════════════════════════
 
 @app.get("/", response_class=HTMLResponse)
-async def serve_index():
-    index = FRONTEND_OUT / "index.html"
-    if index.exists():
-        return FileResponse(index)
+async def serve_index(request: Request):
+    entry = static_index.lookup("index.html")
+    if entry:
+        return static_index.respond(request, entry)
     return HTMLResponse(
         content="<html><body>Frontend not built. Run: cd src/fronted && npm run build</body></html>",
         status_code=200,
@@ -396,13 +925,10 @@ async def serve_index():
 
 
 @app.get("/{full_path:path}", response_class=FileResponse)
-async def serve_static(full_path: str):
-    file_path = FRONTEND_OUT / full_path
-    if file_path.exists() and file_path.is_file():
-        return FileResponse(file_path)
-    index = FRONTEND_OUT / "index.html"
-    if index.exists():
-        return FileResponse(index)
+async def serve_static(full_path: str, request: Request):
+    entry = static_index.lookup(full_path)
+    if entry:
+        return static_index.respond(request, entry)
     return JSONResponse({"error": "Not found"}, status_code=404)
 
 
@@ -448,13 +974,21 @@ class PywebviewApi:
 # Entry points
 # ═══════════════════════════════════════════════════════════════
 
-def run_server(host: str = "127.0.0.1", port: int = 8000, log_level: str = "info"):
+def run_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    log_level: str = "info",
+    profile_dir: str | None = None,
+):
     import uvicorn
 
     logging.basicConfig(
         level=getattr(logging, log_level.upper(), logging.INFO),
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
+    if profile_dir:
+        get_task_manager().set_profile_dir(profile_dir)
+        logger.info(f"Profiling every task into {Path(profile_dir).resolve()}")
     uvicorn.run(app, host=host, port=int(port), log_level=log_level)
 
 
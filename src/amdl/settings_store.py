@@ -0,0 +1,139 @@
+"""In-memory settings.json store.
+
+settings.json is parsed once and served from memory. Edits made to the file
+by hand are picked up on the next read after a (throttled) mtime check.
+Updates are serialised by a lock and written atomically (temp file in the
+same directory + os.replace), so concurrent saves never interleave and a
+crash never leaves a truncated file.
+
+Every change bumps `version`, which the API exposes as an ETag so clients
+can make conditional updates (If-Match). The version starts at a random
+value so an ETag from before a restart never matches.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("amdl.settings")
+
+
+def _file_mode(path: Path) -> int:
+    """Permission bits of `path`, or 0o644 for a new file.
+
+    The umask is not consulted: reading it means setting it, which would
+    race with files created by download and conversion threads.
+    """
+    try:
+        return path.stat().st_mode & 0o7777
+    except OSError:
+        return 0o644
+
+
+class SettingsConflict(Exception):
+    """Raised when a conditional update's expected version is stale."""
+
+    def __init__(self, expected: int, current: int):
+        super().__init__(f"Settings version is {current}, expected {expected}")
+        self.expected = expected
+        self.current = current
+
+
+class SettingsStore:
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        self._mtime_ns: int | None = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self.version = secrets.randbelow(1 << 40)
+
+    # ── reading ───────────────────────────────────────────────
+
+    def _stat_mtime(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, mtime_ns: int | None) -> None:
+        data: dict = {}
+        if mtime_ns is not None:
+            try:
+                loaded = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(loaded, dict):
+                    data = loaded
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read {self.path}: {e}")
+        self._data = data
+        self._mtime_ns = mtime_ns
+        self._loaded = True
+        self.version += 1
+
+    def _refresh(self) -> None:
+        """Reload if the file changed on disk; stats it at most once per check_interval."""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        mtime_ns = self._stat_mtime()
+        if not self._loaded or mtime_ns != self._mtime_ns:
+            self._load(mtime_ns)
+
+    def snapshot(self) -> tuple[dict, int]:
+        """(copy of the settings, version)."""
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._data), self.version
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._data.get(key, default))
+
+    # ── writing ───────────────────────────────────────────────
+
+    def update(self, patch: dict, expected_version: int | None = None) -> int:
+        """Merge `patch` into the settings and persist atomically. Returns the new version.
+
+        Raises SettingsConflict if `expected_version` is given and stale.
+        """
+        with self._lock:
+            self._checked_at = 0.0
+            self._refresh()
+            if expected_version is not None and expected_version != self.version:
+                raise SettingsConflict(expected_version, self.version)
+            merged = {**self._data, **copy.deepcopy(patch)}
+            self._write(merged)
+            self._data = merged
+            self._mtime_ns = self._stat_mtime()
+            self.version += 1
+            return self.version
+
+    def _write(self, data: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file 0600; keep the permissions settings.json had
+            os.chmod(tmp, _file_mode(self.path))
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
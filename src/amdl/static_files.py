@@ -0,0 +1,183 @@
+"""In-memory index of the frontend build output (Next.js static export).
+
+The index maps every request path under the build directory to its size,
+media type, content ETag and any precompressed siblings (`<file>.br`,
+`<file>.gz`). Serving a request is then a dict lookup: no stat() calls, and
+conditional requests (If-None-Match) are answered with 304 without touching
+the disk.
+
+- Hashed build assets under `_next/static/` never change and are served
+  with an immutable, one-year Cache-Control.
+- Everything else (HTML, public files) must be revalidated, which costs a
+  304 as long as the build is unchanged.
+- Strong ETags are derived from the file content. Compressed variants get
+  their own ETag, as required for distinct representations.
+
+A rebuilt frontend is picked up automatically: the index is rebuilt when
+index.html changes (checked at most every `check_interval` seconds). The
+rebuild hashes every file, so it runs in a background thread while
+requests are still answered from the previous index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+logger = logging.getLogger("amdl.static")
+
+# Precompressed sibling suffix per content coding, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE_PREFIX = "_next/static/"
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+
+@dataclass
+class StaticFile:
+    path: Path
+    stat: os.stat_result
+    etag: str
+    media_type: str
+    cache_control: str
+    # content coding → (path, stat, etag) of the precompressed variant
+    variants: dict[str, tuple[Path, os.stat_result, str]] = field(default_factory=dict)
+
+
+def _etag(path: Path, suffix: str = "") -> str:
+    h = hashlib.blake2b(digest_size=12)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return f'"{h.hexdigest()}{suffix}"'
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Content codings from Accept-Encoding with a non-zero q value."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class StaticIndex:
+    def __init__(self, root: Path, check_interval: float = 2.0):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self._files: dict[str, StaticFile] = {}
+        self._index_mtime: int | None = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def build(self) -> int:
+        """(Re)scan the build directory. Blocking; returns the number of indexed files."""
+        files: dict[str, StaticFile] = {}
+        if self.root.is_dir():
+            for dirpath, _, filenames in os.walk(self.root):
+                names = set(filenames)
+                for name in filenames:
+                    path = Path(dirpath) / name
+                    rel = path.relative_to(self.root).as_posix()
+                    try:
+                        entry = StaticFile(
+                            path=path,
+                            stat=path.stat(),
+                            etag=_etag(path),
+                            media_type=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                            cache_control=CACHE_IMMUTABLE if rel.startswith(IMMUTABLE_PREFIX) else CACHE_REVALIDATE,
+                        )
+                        for coding, suffix in ENCODINGS:
+                            if name + suffix in names:
+                                variant = path.with_name(name + suffix)
+                                entry.variants[coding] = (variant, variant.stat(), _etag(variant, f"-{coding}"))
+                    except OSError as e:
+                        logger.debug(f"Skipping static file {path}: {e}")
+                        continue
+                    files[rel] = entry
+        with self._lock:
+            self._files = files
+            self._index_mtime = self._stat_index()
+            self._checked_at = time.monotonic()
+        logger.info(f"Indexed {len(files)} static file(s) under {self.root}")
+        return len(files)
+
+    def _stat_index(self) -> int | None:
+        try:
+            return (self.root / "index.html").stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._stat_index() == self._index_mtime:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="static-index", daemon=True).start()
+
+    def _rebuild(self) -> None:
+        try:
+            self.build()
+        except Exception as e:
+            logger.warning(f"Rebuilding the static index failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def lookup(self, rel_path: str) -> StaticFile | None:
+        """The file for a request path, falling back to index.html (SPA routes)."""
+        self._refresh()
+        files = self._files
+        return files.get(rel_path.lstrip("/")) or files.get("index.html")
+
+    def respond(self, request: Request, entry: StaticFile) -> Response:
+        """200 with the best representation the client accepts, or 304 if its copy is current."""
+        path, stat, etag = entry.path, entry.stat, entry.etag
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        headers = {"cache-control": entry.cache_control}
+        if entry.variants:
+            headers["vary"] = "Accept-Encoding"
+        for coding, _ in ENCODINGS:
+            if coding in accepted and coding in entry.variants:
+                path, stat, etag = entry.variants[coding]
+                headers["content-encoding"] = coding
+                break
+        headers["etag"] = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            headers.pop("content-encoding", None)
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type=entry.media_type, headers=headers, stat_result=stat)
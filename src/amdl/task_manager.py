@@ -1,7 +1,8 @@
 """Task queue manager — manages download task queue, execution, and WebSocket progress push.
 
 Architecture:
-  POST /api/tasks → queue → worker thread → download_urls(progress_callback)
+  POST /api/tasks   → queue → worker thread → download_urls(progress_callback)
+  POST /api/convert →                       → convert_file_list_async(...)
                                                       │
                                                       ▼
                                               asyncio.run_coroutine_threadsafe()
@@ -13,16 +14,36 @@ Architecture:
 from __future__ import annotations
 
 import asyncio
+import bisect
+import heapq
+import itertools
 import logging
 import threading
+import time
 import uuid
+import zlib
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from enum import Enum
 from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Iterable
+
 from fastapi import WebSocket
 
+from amdl.catalog import CatalogPlanner
+from amdl.converter import (
+    collect_convertible_files,
+    convert_file_list_async,
+    resolve_ffmpeg_executable,
+)
 from amdl.core_downloader import download_urls
+from amdl.json_codec import dumps
+from amdl.profiling import TaskProfiler
+from amdl.resources import get_resource_manager
+from amdl.scratch import ScratchDir, get_scratch_manager
+from amdl.url_source import UrlSource
 
 # ── Global singleton ─────────────────────────────────────────
 _task_manager: TaskManager | None = None
@@ -46,92 +67,409 @@ class TaskStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class TaskKind(str, Enum):
+    DOWNLOAD = "download"
+    CONVERT = "convert"
+
+
+# ── Task logs ────────────────────────────────────────────────
+
+class TaskLogStore:
+    """Log lines of every task, kept outside the task records.
+
+    Running tasks append to a plain list. Once a task has finished its lines
+    are packed into a single zlib blob; log lines are highly repetitive, so
+    retained history costs a fraction of the list form.
+    """
+
+    def __init__(self):
+        self._open: dict[str, list[str]] = {}
+        self._sealed: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def append(self, task_id: str, line: str) -> None:
+        with self._lock:
+            self._open.setdefault(task_id, []).append(line)
+
+    def get(self, task_id: str) -> list[str]:
+        with self._lock:
+            lines = list(self._open.get(task_id, ()))
+            blob = self._sealed.get(task_id)
+        return _unpack(blob) + lines if blob else lines
+
+    def seal(self, task_id: str) -> None:
+        """Compress a finished task's lines."""
+        with self._lock:
+            lines = self._open.pop(task_id, None)
+            if not lines:
+                return
+            blob = self._sealed.get(task_id)
+            if blob:
+                lines = _unpack(blob) + lines
+            self._sealed[task_id] = zlib.compress("\n".join(lines).encode("utf-8"), 6)
+
+
+def _unpack(blob: bytes) -> list[str]:
+    return zlib.decompress(blob).decode("utf-8").split("\n")
+
+
+_task_logs = TaskLogStore()
+
+
+# ── Shared task options ──────────────────────────────────────
+
+# Request options minus the URLs, interned: tasks submitted with the same
+# settings profile share one read-only mapping instead of ~40 keys each
+_OPTIONS_CACHE_SIZE = 512
+_options_cache: dict[tuple, MappingProxyType] = {}
+_options_lock = threading.Lock()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _intern_options(options: dict) -> MappingProxyType:
+    try:
+        key = _freeze(options)
+        hash(key)
+    except TypeError:  # unhashable value: nothing to share
+        return MappingProxyType(dict(options))
+    with _options_lock:
+        shared = _options_cache.get(key)
+        if shared is None:
+            if len(_options_cache) >= _OPTIONS_CACHE_SIZE:
+                del _options_cache[next(iter(_options_cache))]
+            shared = _options_cache[key] = MappingProxyType(dict(options))
+        return shared
+
+
 # ── A single download task ───────────────────────────────────
 
+# Process-wide revision counter; next() is atomic, so concurrent writers never reuse a value
+_revisions = itertools.count(1)
+
+# task id → (revision, encoded JSON) of recently served tasks; bounded so
+# retained history doesn't keep a second, serialised copy of every task
+_JSON_CACHE_SIZE = 2048
+_json_cache: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
 class DownloadTask:
-    """Represents a single download task."""
+    """Represents a single download (or standalone conversion) task.
+
+    A compact record: request options are interned (see _intern_options),
+    timestamps are epoch floats formatted on demand, and logs and WebSocket
+    subscribers live in the manager.
+
+    Every attribute assignment bumps `revision`, which invalidates the cached
+    API snapshot. Changes made elsewhere (add_log) call touch().
+    """
+
+    __slots__ = (
+        "id", "kind", "options", "urls", "status", "completed", "total", "error_count", "message",
+        "created_ts", "updated_ts", "cancelled", "scratch", "seq", "revision", "on_status_change",
+        "parent_id", "children",
+    )
 
-    def __init__(self, task_id: str, kwargs: dict):
+    # Attributes that are not part of the API representation
+    _UNTRACKED = frozenset({"revision", "on_status_change"})
+
+    def __init__(self, task_id: str, kwargs: dict, kind: TaskKind = TaskKind.DOWNLOAD):
         self.id = task_id
-        self.kwargs = kwargs  # arguments to pass to download_urls
+        self.kind = kind
+        urls = kwargs.get("urls")
+        self.urls: tuple[str, ...] | None = tuple(urls) if urls is not None else None
+        # arguments to pass to download_urls / the converter, without urls
+        self.options = _intern_options({k: v for k, v in kwargs.items() if k != "urls"})
         self.status = TaskStatus.PENDING
-        self.progress: tuple[int, int] = (0, 0)  # (completed, total)
+        self.completed = 0
+        self.total = 0
         self.error_count: int = 0
         self.message: str = ""
-        self.logs: list[str] = []
-        self.created_at: str = datetime.now(timezone.utc).isoformat()
-        self.updated_at: str = self.created_at
+        self.created_ts: float = time.time()
+        self.updated_ts: float = self.created_ts
         self.cancelled: bool = False
-        self.websockets: list[WebSocket] = []  # WebSocket clients subscribed to this task
-
-    def to_dict(self) -> dict:
-        completed, total = self.progress
-        return {
-            "id": self.id,
-            "status": self.status.value,
-            "progress": {
-                "completed": completed,
-                "total": total,
-                "percent": round(completed / total * 100, 1) if total > 0 else 0,
-            },
-            "error_count": self.error_count,
-            "message": self.message,
-            "logs": self.logs,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-            "urls": self.kwargs.get("urls", []),
-        }
+        self.scratch: ScratchDir | None = None  # per-task temp dir, set once the download starts
+        self.seq: int = 0  # creation order, assigned by TaskManager.submit
+        # Called as (task, old, new) after a status change; keeps the manager's indexes current
+        self.on_status_change: Callable[[DownloadTask, TaskStatus, TaskStatus], None] | None = None
+        self.parent_id: str | None = None  # set on shards of a large task
+        self.children: tuple[str, ...] | None = None  # shard task IDs, set on the parent
+
+    def __setattr__(self, name: str, value) -> None:
+        old = getattr(self, name, None) if name == "status" else None
+        object.__setattr__(self, name, value)
+        if name not in self._UNTRACKED:
+            object.__setattr__(self, "revision", next(_revisions))
+        if old is not None and old != value and self.on_status_change:
+            self.on_status_change(self, old, value)
+
+    def touch(self) -> None:
+        """Mark the task changed after a change outside its own attributes."""
+        self.revision = next(_revisions)
+
+    def mark_updated(self) -> None:
+        self.updated_ts = time.time()
+
+    # ── derived views ─────────────────────────────────────────
+
+    @property
+    def kwargs(self) -> dict:
+        """The full submission arguments as a fresh dict (safe to modify)."""
+        kwargs = dict(self.options)
+        if self.urls is not None:
+            kwargs["urls"] = list(self.urls)
+        return kwargs
+
+    @property
+    def progress(self) -> tuple[int, int]:
+        return self.completed, self.total
+
+    @progress.setter
+    def progress(self, value: tuple[int, int]) -> None:
+        self.completed, self.total = value
+
+    @property
+    def created_at(self) -> str:
+        return _iso(self.created_ts)
+
+    @property
+    def updated_at(self) -> str:
+        return _iso(self.updated_ts)
+
+    @property
+    def logs(self) -> list[str]:
+        return _task_logs.get(self.id)
+
+    def add_log(self, line: str) -> None:
+        _task_logs.append(self.id, line)
+        self.touch()
+
+    # ── API representation ────────────────────────────────────
+
+    def snapshot_json(self) -> bytes:
+        """to_dict() encoded as JSON, cached until the task changes."""
+        revision = self.revision  # read first: a change made while encoding forces a re-encode next time
+        cached = _json_cache.get(self.id)
+        if cached is None or cached[0] != revision:
+            cached = _json_cache[self.id] = (revision, dumps(self.to_dict()))
+            if len(_json_cache) > _JSON_CACHE_SIZE:
+                _json_cache.popitem(last=False)
+        else:
+            _json_cache.move_to_end(self.id)
+        return cached[1]
+
+    def to_dict(self, fields: Iterable[str] | None = None) -> dict:
+        """API representation; `fields` selects (and orders) a subset, e.g. to skip logs."""
+        return {name: _TASK_FIELDS[name](self) for name in (fields or _TASK_FIELDS)}
+
+
+def _progress_dict(task: DownloadTask) -> dict:
+    completed, total = task.completed, task.total
+    return {
+        "completed": completed,
+        "total": total,
+        "percent": round(completed / total * 100, 1) if total > 0 else 0,
+    }
+
+
+# field name → getter, in response order
+_TASK_FIELDS: dict[str, Callable[[DownloadTask], object]] = {
+    "id": lambda t: t.id,
+    "kind": lambda t: t.kind.value,
+    "status": lambda t: t.status.value,
+    "progress": _progress_dict,
+    "error_count": lambda t: t.error_count,
+    "message": lambda t: t.message,
+    "logs": lambda t: t.logs,
+    "created_at": lambda t: t.created_at,
+    "updated_at": lambda t: t.updated_at,
+    "urls": lambda t: list(t.urls or ()),
+    "scratch": lambda t: t.scratch.to_dict() if t.scratch else None,
+    "parent_id": lambda t: t.parent_id,
+    "children": lambda t: list(t.children) if t.children is not None else None,
+}
+
+_FINISHED = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+def _read_url_files(urls: list[str], more_than: int) -> list[str] | None:
+    """Expand .txt URL lists (read_urls_as_txt) into the distinct catalog URLs they contain.
+
+    Returns None, after reading at most `more_than` + 1 URLs, if the lists hold
+    no more than `more_than`: such a task is not sharded and reads its files itself.
+    """
+    planned = iter(CatalogPlanner(UrlSource(urls, read_files=True)))
+    head = [url for url, _ in itertools.islice(planned, more_than + 1)]
+    if len(head) <= more_than:
+        return None
+    head.extend(url for url, _ in planned)
+    return head
 
 
 # ── Task queue manager ───────────────────────────────────────
 
 class TaskManager:
-    """Manages the download task queue, executes tasks sequentially, and pushes progress via WebSocket."""
+    """Manages the download task queue, runs tasks on `max_concurrent` workers, and pushes progress via WebSocket.
+
+    Download tasks with more than `shard_size` URLs are split into shard
+    tasks that run independently across the workers. The submitted task
+    becomes their parent: it is never run itself, and aggregates the shards'
+    progress, errors and status. Cancelling it cancels every unfinished shard.
+    """
 
-    def __init__(self, max_concurrent: int = 1):
+    def __init__(self, max_concurrent: int = 1, profile_dir: Path | None = None, shard_size: int = 200):
         self._tasks: dict[str, DownloadTask] = {}
-        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        # Listing indexes: seq → task, every seq in creation order, and the seqs of each status.
+        # Seqs only grow, so appends keep the lists sorted; status moves use bisect.
+        self._by_seq: dict[int, DownloadTask] = {}
+        self._all_seqs: list[int] = []
+        self._status_seqs: dict[TaskStatus, list[int]] = {s: [] for s in TaskStatus}
+        self._seq = itertools.count(1)
+        self._subscribers: dict[str, list[WebSocket]] = {}  # task id → WebSocket clients
+        self._status_listener = self._on_status_change  # one bound method shared by all tasks
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue()  # None wakes a worker to retire
         self._max_concurrent = max_concurrent
+        self.shard_size = shard_size  # 0 disables sharding
         self._loop: asyncio.AbstractEventLoop | None = None
-        self._worker_task: asyncio.Task | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retiring = 0  # workers asked to exit after their current task
         self._thread_pool = ThreadPoolExecutor(max_workers=max_concurrent)
-        self._lock = threading.Lock()
+        self._lock = threading.RLock()
+        # Where per-task profiles are written. profile_all=True profiles every
+        # task (amdl --server --profile-dir DIR); otherwise only tasks that
+        # were submitted with profile=True.
+        self.profile_dir: Path = Path(profile_dir) if profile_dir else Path("./profiles")
+        self.profile_all: bool = profile_dir is not None
+
+    def set_profile_dir(self, profile_dir: Path | str, profile_all: bool = True):
+        """Configure where profile artifacts go and whether every task is profiled."""
+        self.profile_dir = Path(profile_dir)
+        self.profile_all = profile_all
+
+    def configure(self, max_concurrent: int | None = None, shard_size: int | None = None):
+        """Change the worker count and shard size; applies to tasks started / submitted afterwards."""
+        if shard_size is not None:
+            self.shard_size = max(0, shard_size)
+        if max_concurrent is not None and max(1, max_concurrent) != self._max_concurrent:
+            grow = max_concurrent > self._max_concurrent
+            self._max_concurrent = max(1, max_concurrent)
+            if grow:
+                # Running downloads finish on the old pool
+                old, self._thread_pool = self._thread_pool, ThreadPoolExecutor(max_workers=self._max_concurrent)
+                old.shutdown(wait=False)
+            self._spawn_workers()
 
     # ── Lifecycle ────────────────────────────────────────
 
     def start(self, loop: asyncio.AbstractEventLoop | None = None):
-        """Start the background worker coroutine. Call this on FastAPI startup."""
+        """Start the background worker coroutines. Call this on FastAPI startup."""
         self._loop = loop or asyncio.get_event_loop()
-        self._worker_task = self._loop.create_task(self._worker_loop())
+        self._spawn_workers()
+
+    def _spawn_workers(self):
+        """Start or retire workers until `max_concurrent` of them remain."""
+        if self._loop is None:
+            return
+        self._workers = [w for w in self._workers if not w.done()]
+        excess = len(self._workers) - self._retiring - self._max_concurrent
+        if excess > 0:
+            # Queued tasks keep their order: a sentinel only wakes an idle worker
+            self._retiring += excess
+            for _ in range(excess):
+                self._queue.put_nowait(None)
+        elif excess < 0:
+            kept = min(self._retiring, -excess)
+            self._retiring -= kept
+            for _ in range(-excess - kept):
+                self._workers.append(self._loop.create_task(self._worker_loop()))
 
     async def stop(self):
-        """Stop the background worker. Call this on FastAPI shutdown."""
-        if self._worker_task:
-            self._worker_task.cancel()
+        """Stop the background workers. Call this on FastAPI shutdown."""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
             try:
-                await self._worker_task
+                await worker
             except asyncio.CancelledError:
                 pass
+        self._workers.clear()
+        self._retiring = 0
         self._thread_pool.shutdown(wait=False)
         # Close all remaining WebSocket connections
-        for task in self._tasks.values():
-            for ws in task.websockets:
+        for subscribers in self._subscribers.values():
+            for ws in subscribers:
                 try:
                     await ws.close()
                 except Exception:
                     pass
-            task.websockets.clear()
+        self._subscribers.clear()
 
     # ── Task submission ──────────────────────────────────
 
-    async def submit(self, kwargs: dict) -> str:
-        """Submit a download task and return the task_id."""
-        task_id = str(uuid.uuid4())
-        task = DownloadTask(task_id, kwargs)
+    async def submit(self, kwargs: dict, kind: TaskKind = TaskKind.DOWNLOAD) -> str:
+        """Submit a download (or conversion) task and return the task_id."""
+        return (await self.submit_many([kwargs], kind))[0]
+
+    async def submit_many(self, kwargs_list: list[dict], kind: TaskKind = TaskKind.DOWNLOAD) -> list[str]:
+        """Submit several tasks at once; all of them are registered before any is queued.
+
+        Returns one ID per submission: the task itself, or the parent of its shards.
+        """
+        tasks: list[DownloadTask] = []
+        runnable: list[DownloadTask] = []
+        top_level: list[str] = []
+        for kwargs in kwargs_list:
+            run_kwargs = kwargs
+            if kind == TaskKind.DOWNLOAD and kwargs.get("read_urls_as_txt") and self.shard_size:
+                # Expand URL files up front only when they are large enough to be sharded
+                urls = await asyncio.to_thread(_read_url_files, kwargs.get("urls") or [], self.shard_size)
+                if urls is not None:
+                    run_kwargs = {**kwargs, "urls": urls, "read_urls_as_txt": False}
+            task = DownloadTask(str(uuid.uuid4()), kwargs, kind)
+            tasks.append(task)
+            top_level.append(task.id)
+            shards = self._make_shards(task, run_kwargs)
+            if shards and run_kwargs is kwargs:
+                # The shards hold the URLs; a parent keeps only submitted URL files
+                task.urls = ()
+            tasks += shards
+            runnable += shards or [task]
         with self._lock:
-            self._tasks[task_id] = task
-        await self._queue.put(task_id)
-        return task_id
+            for task in tasks:
+                task.seq = next(self._seq)
+                self._tasks[task.id] = task
+                self._by_seq[task.seq] = task
+                self._all_seqs.append(task.seq)
+                self._status_seqs[task.status].append(task.seq)
+                task.on_status_change = self._status_listener
+        for task in runnable:
+            self._queue.put_nowait(task.id)  # unbounded queue: never blocks
+        return top_level
+
+    def _make_shards(self, parent: DownloadTask, kwargs: dict) -> list[DownloadTask]:
+        urls = kwargs.get("urls") or []
+        size = self.shard_size
+        if parent.kind != TaskKind.DOWNLOAD or not size or len(urls) <= size:
+            return []
+        shards = [
+            DownloadTask(str(uuid.uuid4()), {**kwargs, "urls": urls[i:i + size]}, parent.kind)
+            for i in range(0, len(urls), size)
+        ]
+        for shard in shards:
+            shard.parent_id = parent.id
+        parent.children = tuple(shard.id for shard in shards)
+        parent.message = f"已拆分为 {len(shards)} 个分片（每片最多 {size} 个 URL）"
+        return shards
 
     # ── Task queries ─────────────────────────────────────
 
@@ -140,12 +478,100 @@ class TaskManager:
             return self._tasks.get(task_id)
 
     def list_tasks(self) -> list[DownloadTask]:
+        """All tasks, newest first."""
         with self._lock:
-            return sorted(
-                self._tasks.values(),
-                key=lambda t: t.created_at,
-                reverse=True,
-            )
+            return [self._by_seq[seq] for seq in reversed(self._all_seqs)]
+
+    def page_tasks(
+        self,
+        statuses: Iterable[TaskStatus] | None = None,
+        limit: int | None = None,
+        cursor: int | None = None,
+    ) -> tuple[list[DownloadTask], int | None, int]:
+        """One page of tasks, newest first, optionally filtered by status.
+
+        Returns (tasks, next_cursor, total matching); limit=None returns every
+        match. Pass next_cursor back as `cursor` for the following page; it is
+        None on the last page. Costs
+        O(statuses × limit), independent of the task history.
+        """
+        with self._lock:
+            lists = [self._all_seqs] if statuses is None else [self._status_seqs[s] for s in set(statuses)]
+            total = sum(len(seqs) for seqs in lists)
+            if limit is None:
+                limit = max(1, total)
+            runs = []
+            for seqs in lists:
+                end = len(seqs) if cursor is None else bisect.bisect_left(seqs, cursor)
+                runs.append(reversed(seqs[max(0, end - limit - 1):end]))
+            # limit + 1 to learn whether another page follows
+            page = list(itertools.islice(heapq.merge(*runs, reverse=True), limit + 1))
+            next_cursor = page[limit - 1] if len(page) > limit else None
+            return [self._by_seq[seq] for seq in page[:limit]], next_cursor, total
+
+    def status_counts(self) -> dict[str, int]:
+        with self._lock:
+            return {status.value: len(seqs) for status, seqs in self._status_seqs.items()}
+
+    def _on_status_change(self, task: DownloadTask, old: TaskStatus, new: TaskStatus) -> None:
+        with self._lock:
+            seqs = self._status_seqs[old]
+            i = bisect.bisect_left(seqs, task.seq)
+            if i < len(seqs) and seqs[i] == task.seq:
+                del seqs[i]
+            bisect.insort(self._status_seqs[new], task.seq)
+        if task.parent_id:
+            self._refresh_parent(task.parent_id)
+
+    def _refresh_parent(self, parent_id: str) -> None:
+        """Recompute a parent's progress, errors and status from its shards (any thread)."""
+        with self._lock:
+            parent = self._tasks.get(parent_id)
+            if parent is None or parent.status in _FINISHED:
+                return
+            shards = [self._tasks[child_id] for child_id in parent.children or ()]
+            completed = total = errors = 0
+            finished = started = cancelled = 0
+            for shard in shards:
+                completed += shard.completed
+                total += shard.total
+                if shard.status == TaskStatus.FAILED:
+                    errors += shard.error_count or len(shard.urls or ())
+                else:
+                    errors += shard.error_count
+                finished += shard.status in _FINISHED
+                started += shard.status != TaskStatus.PENDING
+                cancelled += shard.status == TaskStatus.CANCELLED
+            parent.progress = (completed, total)
+            parent.error_count = errors
+            if finished < len(shards):
+                if started:
+                    parent.status = TaskStatus.RUNNING
+                parent.message = f"分片 {finished}/{len(shards)} 已结束"
+                self._post(self._broadcast_progress(parent_id, completed, total))
+                return
+            url_count = sum(len(shard.urls or ()) for shard in shards)
+            if cancelled == len(shards):
+                parent.status = TaskStatus.CANCELLED
+                parent.message = "已取消"
+            elif errors == 0 and not cancelled:
+                parent.status = TaskStatus.COMPLETED
+                parent.message = "全部完成"
+            elif errors >= url_count:
+                parent.status = TaskStatus.FAILED
+                parent.message = f"全部失败（{errors} 个错误）"
+            else:
+                parent.status = TaskStatus.COMPLETED
+                parent.message = f"部分完成（{errors} 个错误）" + (f"，{cancelled} 个分片已取消" if cancelled else "")
+            parent.mark_updated()
+        self._post(self._broadcast_status(parent))
+
+    def _post(self, coro) -> None:
+        """Schedule a coroutine on the server loop from any thread."""
+        if self._loop and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(coro, self._loop)
+        else:
+            coro.close()
 
     # ── Task cancellation ────────────────────────────────
 
@@ -159,16 +585,29 @@ class TaskManager:
         task.cancelled = True
         task.status = TaskStatus.CANCELLED
         task.message = "已取消"
-        task.updated_at = datetime.now(timezone.utc).isoformat()
+        task.mark_updated()
         await self._broadcast_status(task)
+        for child_id in task.children or ():
+            await self.cancel_task(child_id)
         return True
 
+    async def cancel_tasks(self, task_ids: Iterable[str]) -> list[str]:
+        """Cancel several tasks; returns the IDs that were actually cancelled."""
+        return [task_id for task_id in dict.fromkeys(task_ids) if await self.cancel_task(task_id)]
+
     # ── Background worker loop ───────────────────────────
 
     async def _worker_loop(self):
         """Continuously pick tasks from the queue and execute them in a thread pool."""
         while True:
+            if self._retiring > 0:
+                # Worker count was lowered
+                self._retiring -= 1
+                return
             task_id = await self._queue.get()
+            if task_id is None:
+                self._queue.task_done()
+                continue
             task = self.get_task(task_id)
             if not task or task.cancelled:
                 self._queue.task_done()
@@ -176,7 +615,7 @@ class TaskManager:
 
             # Mark as RUNNING
             task.status = TaskStatus.RUNNING
-            task.updated_at = datetime.now(timezone.utc).isoformat()
+            task.mark_updated()
             await self._broadcast_status(task)
 
             loop = asyncio.get_running_loop()
@@ -189,13 +628,14 @@ class TaskManager:
             except Exception as e:
                 task.status = TaskStatus.FAILED
                 task.message = f"Internal error: {e}"
-                task.updated_at = datetime.now(timezone.utc).isoformat()
+                task.mark_updated()
                 await self._broadcast_status(task)
             finally:
+                _task_logs.seal(task_id)
                 self._queue.task_done()
 
     def _execute_download(self, task_id: str):
-        """Execute the download in a worker thread (no async code here)."""
+        """Execute the task in a worker thread (any async work runs on a private loop)."""
         task = self.get_task(task_id)
         if not task or task.cancelled:
             return
@@ -206,6 +646,8 @@ class TaskManager:
             if task.cancelled:
                 raise InterruptedError("Task cancelled")
             task.progress = (completed, total)
+            if task.parent_id:
+                self._refresh_parent(task.parent_id)
             # Bridge: worker thread → event loop → WebSocket
             if self._loop and not self._loop.is_closed():
                 asyncio.run_coroutine_threadsafe(
@@ -213,15 +655,43 @@ class TaskManager:
                     self._loop,
                 )
 
+        # ── Build conversion progress callback ───────────
+        def on_conversion_progress(file: str, percent: float, speed: str | None):
+            """Called per ffmpeg progress block while converting a file."""
+            if task.cancelled:
+                raise InterruptedError("Task cancelled")
+            if self._loop and not self._loop.is_closed():
+                asyncio.run_coroutine_threadsafe(
+                    self._broadcast_conversion_progress(task_id, file, percent, speed),
+                    self._loop,
+                )
+
         # ── Build log callback ───────────────────────────
         def on_log(msg: str):
-            task.logs.append(msg)
+            task.add_log(msg)
             logging.getLogger("amdl.task").info(f"[{task_id[:8]}] {msg}")
 
-        # ── Execute download ─────────────────────────────
+        # ── Execute download / conversion ────────────────
+        kwargs = task.kwargs
+        run = self._run_conversion if task.kind == TaskKind.CONVERT else self._run_download
+        if kwargs.pop("profile", False) or self.profile_all:
+            with TaskProfiler(self.profile_dir, task_id):
+                run(task, kwargs, on_progress, on_log, on_conversion_progress)
+        else:
+            run(task, kwargs, on_progress, on_log, on_conversion_progress)
+
+        # Broadcast final status to subscribers
+        if self._loop and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(
+                self._broadcast_status(task),
+                self._loop,
+            )
+
+    def _run_download(self, task: DownloadTask, kwargs: dict, on_progress, on_log, on_conversion_progress):
+        """Call download_urls() with the task's arguments and record the outcome."""
+        task_id = task.id
         try:
-            kwargs = task.kwargs.copy()
-            kwargs["progress_callback"] = on_progress
+            kwargs["conversion_progress_callback"] = on_conversion_progress
             kwargs["log_callback"] = on_log
             kwargs["no_exceptions"] = True  # always handle internally
 
@@ -235,11 +705,29 @@ class TaskManager:
             if isinstance(wvd, str):
                 kwargs["wvd_path"] = Path(wvd) if wvd else None
 
-            err_count = download_urls(**kwargs)
+            # Decrypt / remux work of a running download counts against the shared CPU budget.
+            # gamdl stages into a scratch dir of this task only, removed when the task ends.
+            task_dir = get_scratch_manager().task_dir(
+                task_id,
+                kwargs.get("temp_path") or Path("./temp"),
+                kwargs.get("urls", []),
+                read_files=bool(kwargs.get("read_urls_as_txt")),
+            )
+            with get_resource_manager().reserve(), task_dir as scratch:
+                kwargs["temp_path"] = scratch.path
+                task.scratch = scratch
+
+                def on_item_progress(current: int, total: int):
+                    scratch.sample()
+                    on_progress(current, total)
+
+                kwargs["progress_callback"] = on_item_progress
+                err_count = download_urls(**kwargs)
+            on_log(f"临时目录峰值占用 {scratch.peak_bytes / (1024 * 1024):.1f} MiB{'（内存）' if scratch.in_ram else ''}")
 
             if not task.cancelled:
                 task.error_count = err_count
-                url_count = len(task.kwargs.get("urls", []))
+                url_count = len(task.urls or ())
                 if err_count == 0:
                     task.status = TaskStatus.COMPLETED
                     task.message = "全部完成"
@@ -249,25 +737,82 @@ class TaskManager:
                 else:
                     task.status = TaskStatus.COMPLETED
                     task.message = f"部分完成（{err_count} 个错误）"
-                task.updated_at = datetime.now(timezone.utc).isoformat()
+                task.mark_updated()
 
         except InterruptedError:
             task.status = TaskStatus.CANCELLED
             task.message = "已取消"
-            task.updated_at = datetime.now(timezone.utc).isoformat()
+            task.mark_updated()
         except Exception as e:
             task.status = TaskStatus.FAILED
             task.message = str(e)
-            task.updated_at = datetime.now(timezone.utc).isoformat()
+            task.mark_updated()
             logging.getLogger("amdl.task").error(
                 f"[{task_id[:8]}] Download failed: {e}", exc_info=True
             )
 
-        # Broadcast final status to subscribers
-        if self._loop and not self._loop.is_closed():
-            asyncio.run_coroutine_threadsafe(
-                self._broadcast_status(task),
-                self._loop,
+    def _run_conversion(self, task: DownloadTask, kwargs: dict, on_progress, on_log, on_conversion_progress):
+        """Run a standalone batch conversion (POST /api/convert) and record the outcome."""
+        task_id = task.id
+        try:
+            audio_format = kwargs.get("audio_format")
+            video_format = kwargs.get("video_format")
+            exe = resolve_ffmpeg_executable(kwargs.get("ffmpeg_path") or "ffmpeg")
+            if not exe:
+                raise RuntimeError(f"FFmpeg not found: {kwargs.get('ffmpeg_path')}")
+
+            files = collect_convertible_files(
+                kwargs.get("directory"),
+                kwargs.get("files"),
+                audio_format,
+                video_format,
+            )
+            total = len(files)
+            on_log(f"Found {total} file(s) to convert")
+            on_progress(0, total)
+
+            done = failed = 0
+
+            def on_file_done(source: str, targets: list[str]):
+                nonlocal done, failed
+                done += 1
+                failed += not targets
+                on_progress(done, total)
+
+            converted = asyncio.run(convert_file_list_async(
+                files,
+                audio_format,
+                video_format,
+                exe,
+                on_log,
+                on_conversion_progress,
+                kwargs.get("concurrency"),
+                on_file_done,
+            ))
+
+            if not task.cancelled:
+                task.error_count = failed
+                if failed == 0:
+                    task.status = TaskStatus.COMPLETED
+                    task.message = f"全部完成（{len(converted)} 个文件）"
+                elif not converted:
+                    task.status = TaskStatus.FAILED
+                    task.message = f"全部失败（{failed} 个错误）"
+                else:
+                    task.status = TaskStatus.COMPLETED
+                    task.message = f"部分完成（{failed} 个错误）"
+                task.mark_updated()
+
+        except InterruptedError:
+            task.status = TaskStatus.CANCELLED
+            task.message = "已取消"
+            task.mark_updated()
+        except Exception as e:
+            task.status = TaskStatus.FAILED
+            task.message = str(e)
+            task.mark_updated()
+            logging.getLogger("amdl.task").error(
+                f"[{task_id[:8]}] Conversion failed: {e}", exc_info=True
             )
 
     # ── WebSocket broadcasting ──────────────────────────
@@ -285,6 +830,19 @@ class TaskManager:
         }
         await self._send_to_subscribers(task, message)
 
+    async def _broadcast_conversion_progress(self, task_id: str, file: str, percent: float, speed: str | None):
+        task = self.get_task(task_id)
+        if not task:
+            return
+        message = {
+            "type": "conversion_progress",
+            "task_id": task_id,
+            "file": file,
+            "percent": percent,
+            "speed": speed,
+        }
+        await self._send_to_subscribers(task, message)
+
     async def _broadcast_status(self, task: DownloadTask):
         completed, total = task.progress[0], task.progress[1]
         message = {
@@ -306,14 +864,15 @@ class TaskManager:
     async def _send_to_subscribers(self, task: DownloadTask, message: dict):
         """Send a message to all WebSocket clients subscribed to this task. Clean up dead connections."""
         dead: list[WebSocket] = []
-        for ws in task.websockets:
+        subscribers = self._subscribers.get(task.id, [])
+        for ws in list(subscribers):
             try:
                 await ws.send_json(message)
             except Exception:
                 dead.append(ws)
         for ws in dead:
             try:
-                task.websockets.remove(ws)
+                subscribers.remove(ws)
             except ValueError:
                 pass
 
@@ -324,7 +883,7 @@ class TaskManager:
         task = self.get_task(task_id)
         if not task:
             return False
-        task.websockets.append(ws)
+        self._subscribers.setdefault(task_id, []).append(ws)
         # Send current state immediately
         try:
             completed, total = task.progress
@@ -345,9 +904,8 @@ class TaskManager:
         return True
 
     async def unsubscribe(self, task_id: str, ws: WebSocket):
-        task = self.get_task(task_id)
-        if task and ws in task.websockets:
-            try:
-                task.websockets.remove(ws)
-            except ValueError:
-                pass
\ No newline at end of file
+        subscribers = self._subscribers.get(task_id)
+        if subscribers and ws in subscribers:
+            subscribers.remove(ws)
+            if not subscribers:
+                del self._subscribers[task_id]
\ No newline at end of file
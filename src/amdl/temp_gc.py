@@ -0,0 +1,235 @@
+"""Background garbage collection for download temp directories.
+
+gamdl stages every item under <temp_path>/gamdl_temp_<uuid>/ and removes it
+when the item finishes, but cancelled tasks, crashes and failed remuxes leave
+those directories behind. TempGC removes such leftovers without touching
+anything a running task may still be using.
+
+A root either belongs to the app as a whole (the server's own temp
+directory) or is a user-chosen directory, such as a task's `temp_path` or a
+scratch mount, that may hold unrelated files. In a user-chosen root only
+entries named like the app's own (`gamdl_temp_*` or the caller's prefix)
+are ever looked at.
+
+Running tasks register their own scratch directory through `in_use()`
+(see amdl.scratch); its parent becomes such a filtered root. Live entries
+are never touched while their task runs, however old they are. Every other
+matching entry of a root is an orphan. A collection pass removes:
+
+- orphans older than `min_age` (all orphans when forced, e.g. DELETE /api/temp)
+- further orphans, oldest first, while the roots exceed `max_bytes`
+
+All filesystem work is blocking; callers run collect() in a worker thread.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+logger = logging.getLogger("amdl.temp_gc")
+
+# Entries gamdl creates in its temp_path
+GAMDL_TEMP_PREFIX = "gamdl_temp_"
+
+
+@dataclass
+class GCReport:
+    removed: int = 0
+    bytes_reclaimed: int = 0
+    kept: int = 0
+    bytes_kept: int = 0
+    errors: list[str] = field(default_factory=list)
+    started_at: float = 0.0
+    duration_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _Entry:
+    path: Path
+    size: int
+    mtime: float  # newest mtime anywhere inside the entry
+
+
+def _measure(path: Path) -> _Entry:
+    """Total size and newest mtime of a file or directory tree."""
+    try:
+        st = path.lstat()
+    except OSError:
+        return _Entry(path, 0, 0.0)
+    size, newest = st.st_size, st.st_mtime
+    if path.is_dir() and not path.is_symlink():
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in dirnames + filenames:
+                try:
+                    st = os.lstat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                if name in filenames:
+                    size += st.st_size
+                newest = max(newest, st.st_mtime)
+    return _Entry(path, size, newest)
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+class TempGC:
+    def __init__(
+        self,
+        min_age: float = 15 * 60,
+        max_bytes: int | None = None,
+        interval: float = 10 * 60,
+    ):
+        self.min_age = min_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.last_report: GCReport | None = None
+        # root → name prefixes of collectable entries; None: every entry is ours
+        self._roots: dict[Path, frozenset[str] | None] = {}
+        self._live: Counter[Path] = Counter()
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+
+    def configure(
+        self,
+        min_age: float | None = None,
+        max_bytes: int | None = None,
+        interval: float | None = None,
+    ) -> None:
+        if min_age is not None:
+            self.min_age = min_age
+        self.max_bytes = max_bytes
+        if interval is not None:
+            self.interval = interval
+
+    # ── registration ──────────────────────────────────────────
+
+    def add_root(self, root: Path | str, prefixes: Iterable[str] | None = None) -> None:
+        """Register a root. With `prefixes`, only entries whose name starts with one are collected."""
+        with self._lock:
+            self._add_root(Path(root).resolve(), prefixes)
+
+    def _add_root(self, root: Path, prefixes: Iterable[str] | None) -> None:
+        if root in self._roots and self._roots[root] is None:
+            return
+        if prefixes is None:
+            self._roots[root] = None
+        else:
+            self._roots[root] = (self._roots.get(root) or frozenset()) | frozenset(prefixes)
+
+    @contextlib.contextmanager
+    def in_use(self, entry: Path | str, prefix: str | None = None) -> Iterator[None]:
+        """Mark a task's temp entry as live for the duration of the block.
+
+        Its parent becomes a root limited to gamdl's temp entries and `prefix`.
+        """
+        path = Path(entry).resolve()
+        prefixes = (GAMDL_TEMP_PREFIX, prefix) if prefix else (GAMDL_TEMP_PREFIX,)
+        with self._lock:
+            self._add_root(path.parent, prefixes)
+            self._live[path] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._live[path] -= 1
+                if self._live[path] <= 0:
+                    del self._live[path]
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "roots": {str(r): sorted(p) if p is not None else None for r, p in sorted(self._roots.items())},
+                "live": sorted(str(r) for r in self._live),
+                "min_age_s": self.min_age,
+                "max_bytes": self.max_bytes,
+                "interval_s": self.interval,
+                "last_report": self.last_report.to_dict() if self.last_report else None,
+            }
+
+    # ── collection ────────────────────────────────────────────
+
+    def collect(self, force: bool = False) -> GCReport:
+        """Remove orphaned temp entries; returns what was reclaimed. Blocking."""
+        with self._collect_lock:
+            report = GCReport(started_at=time.time())
+            t0 = time.monotonic()
+            with self._lock:
+                roots = list(self._roots.items())
+                live = set(self._live)
+
+            now = time.time()
+            orphans: list[_Entry] = []
+            total = 0
+            for root, prefixes in roots:
+                try:
+                    children = list(root.iterdir())
+                except OSError:
+                    continue
+                if prefixes is not None:
+                    prefixes = tuple(prefixes)
+                    children = [c for c in children if c.name.startswith(prefixes)]
+                for child in children:
+                    entry = _measure(child)
+                    total += entry.size
+                    if child in live:
+                        report.kept += 1
+                        report.bytes_kept += entry.size
+                    else:
+                        orphans.append(entry)
+
+            orphans.sort(key=lambda e: e.mtime)
+            for entry in orphans:
+                expired = force or now - entry.mtime >= self.min_age
+                over_budget = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or over_budget):
+                    report.kept += 1
+                    report.bytes_kept += entry.size
+                    continue
+                try:
+                    _remove(entry.path)
+                except OSError as e:
+                    report.errors.append(f"{entry.path}: {e}")
+                    continue
+                report.removed += 1
+                report.bytes_reclaimed += entry.size
+                total -= entry.size
+
+            report.duration_s = round(time.monotonic() - t0, 3)
+            self.last_report = report
+            if report.removed or report.errors:
+                logger.info(
+                    f"Temp GC: removed {report.removed} item(s), "
+                    f"reclaimed {report.bytes_reclaimed / (1024 * 1024):.1f} MiB, "
+                    f"{len(report.errors)} error(s)"
+                )
+            return report
+
+
+# ── Global singleton ─────────────────────────────────────────
+
+_temp_gc: TempGC | None = None
+
+
+def get_temp_gc() -> TempGC:
+    """Get the global TempGC singleton."""
+    global _temp_gc
+    if _temp_gc is None:
+        _temp_gc = TempGC()
+    return _temp_gc
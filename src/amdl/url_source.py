@@ -0,0 +1,75 @@
+"""Lazy, de-duplicating URL source for download tasks.
+
+With read_urls_as_txt every argument that names an existing file is read
+line by line; anything else is taken as a URL. Only one line is held in
+memory at a time. Lines are stripped, and blank lines and comments
+(`#` or `;`) are skipped.
+
+URLs are normalised (scheme and host lowercased, fragment dropped) and each
+distinct URL is yielded once. Only an 8-byte hash of every URL seen is
+kept, not the URL itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+COMMENT_PREFIXES = ("#", ";")
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host and drop the fragment; non-URLs are returned stripped."""
+    url = url.strip()
+    scheme, sep, rest = url.partition("://")
+    if not sep or not scheme.isalpha():
+        return url
+    host, slash, path = rest.partition("#")[0].partition("/")
+    return f"{scheme.lower()}://{host.lower()}{slash}{path}"
+
+
+def digest(text: str) -> int:
+    """8-byte hash used for de-duplication sets."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class UrlSource:
+    """Iterate over the URLs of `inputs`, reading URL files lazily and skipping duplicates.
+
+    Counters (`duplicates`, `skipped`) are filled in while iterating. A source
+    can be iterated once.
+    """
+
+    def __init__(self, inputs: Iterable[str], read_files: bool = False):
+        self.inputs = inputs
+        self.read_files = read_files
+        self.yielded = 0
+        self.duplicates = 0
+        self.skipped = 0  # blank and comment lines
+        self._seen: set[int] = set()
+
+    def _lines(self) -> Iterator[str]:
+        for item in self.inputs:
+            path = Path(item) if self.read_files else None
+            if path is not None and path.is_file():
+                # utf-8-sig: URL lists saved by Windows editors start with a BOM
+                with open(path, encoding="utf-8-sig") as f:
+                    yield from f
+            else:
+                yield item
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self._lines():
+            line = line.strip()
+            if not line or line.startswith(COMMENT_PREFIXES):
+                self.skipped += 1
+                continue
+            url = normalize_url(line)
+            key = digest(url)
+            if key in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(key)
+            self.yielded += 1
+            yield url
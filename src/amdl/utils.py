@@ -1,7 +1,18 @@
+import subprocess
 import sys
 from pathlib import Path
 
 
+def get_startupinfo():
+    """Windows 下隐藏子进程的命令行窗口，其他系统返回 None"""
+    if sys.platform == "win32":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        return startupinfo
+    return None
+
+
 def resource_path(relative_path: str) -> str:
     """返回运行时资源的绝对路径。支持源码运行与 PyInstaller 打包后的 _MEIPASS。"""
     try: